@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Heating rate and ramp tracking computed on the fly, sample by sample.
+
+A RampTracker is fed with each reading and the rate and limit set on the
+controller. It keeps running sums for a linear regression of the temperature
+over the last samples, so each update costs the same whatever the window,
+and compares the measured temperature with the commanded ramp. Enable it
+with programmer.enable_analytics(): each snapshot then carries a RampState
+in reading.analytics.
+"""
+import collections
+import math
+
+HEATING_OR_COOLING = (0x10, 0x20) # SB1 values while ramping
+LIMIT_REACHED = (0x30, 0x40) # SB1 values when the controller holds at the limit
+
+RampState = collections.namedtuple('RampState', [
+    'rate', # measured rate (°C/min), regression over the window
+    'rate_ewma', # smoothed measured rate (°C/min)
+    'commanded_rate', # rate of the commanded ramp, negative when cooling (°C/min)
+    'rate_error', # rate_ewma - commanded_rate (°C/min)
+    'expected', # temperature on the commanded ramp (°C)
+    'tracking_error', # measured - expected temperature (°C)
+    'lag', # delay of the temperature behind the commanded ramp (s)
+    'time_to_limit', # estimated time left to reach the limit (s)
+    'overshoot', # max excess beyond the limit since it was reached (°C)
+])
+
+
+class RampTracker(object):
+    """
+    rolling regression of the temperature and comparison with the commanded ramp
+    """
+    def __init__(self, window=30, alpha=0.1):
+        """
+        Parameters
+        ----------
+        window : int, optional
+            number of samples of the rate regression. The default is 30.
+        alpha : float, optional
+            weight of a new rate in the exponential moving average. The default is 0.1.
+        """
+        self.window = window
+        self.alpha = alpha
+        self.samples = collections.deque()
+        # sums of the regression, with the times counted from origin
+        self.origin = None
+        self.St = self.ST = self.Stt = self.StT = 0.0
+        self.updates = 0 # running updates of the sums since they were computed from the samples
+        self.rate_ewma = None
+        self.state = None # last RampState
+        # commanded ramp
+        self.ramp = None # (t_start, T_start, rate, limit, direction)
+        self.last_SB1 = None
+        self.overshoot = None
+        # run summary
+        self.count = 0
+        self.t_first = None
+        self.t_last = None
+        self.ramps = 0
+        self.max_rate = None
+        self.min_rate = None
+        self.max_abs_error = 0.0
+        self.sum_error2 = 0.0
+        self.n_error = 0
+        self.sum_lag = 0.0
+        self.n_lag = 0
+        self.max_overshoot = None
+
+    def recenter(self):
+        # compute the sums again from the samples, with the oldest one as origin:
+        # the times stay as short as the window and the rounding errors of the
+        # running updates do not pile up over a long run
+        self.origin = origin = self.samples[0][0]
+        St = ST = Stt = StT = 0.0
+        for t, T in self.samples:
+            t -= origin
+            St += t
+            ST += T
+            Stt += t*t
+            StT += t*T
+        self.St, self.ST, self.Stt, self.StT = St, ST, Stt, StT
+        self.updates = 0
+
+    def regression(self, t, T):
+        # slope of T(t) over the window (°C/s), None with less than 2 samples
+        self.samples.append((t, T))
+        if len(self.samples) > self.window:
+            t_old, T_old = self.samples.popleft()
+            t_old -= self.origin
+            self.St -= t_old
+            self.ST -= T_old
+            self.Stt -= t_old*t_old
+            self.StT -= t_old*T_old
+        self.updates += 1
+        if self.origin is None or self.updates >= self.window:
+            self.recenter() # once every window samples: O(1) per sample on average
+        else:
+            t -= self.origin
+            self.St += t
+            self.ST += T
+            self.Stt += t*t
+            self.StT += t*T
+        n = len(self.samples)
+        Sxx = self.Stt - self.St*self.St/n
+        if n < 2 or Sxx <= 0:
+            return None
+        return (self.StT - self.St*self.ST/n)/Sxx
+
+    def update_ramp(self, t, T, SB1, rate, limit):
+        # start, keep or end the commanded ramp
+        if SB1 not in HEATING_OR_COOLING + LIMIT_REACHED or rate is None or limit is None:
+            self.ramp = None
+        elif (self.ramp is None
+              or (SB1 in HEATING_OR_COOLING and self.last_SB1 not in HEATING_OR_COOLING)
+              or (self.ramp[2], self.ramp[3]) != (rate, limit)):
+            direction = 1 if limit >= T else -1
+            self.ramp = (t, T, rate, limit, direction)
+            self.overshoot = None
+            self.ramps += 1
+        self.last_SB1 = SB1
+
+    def update(self, reading, rate=None, limit=None):
+        """
+        add a reading
+
+        Parameters
+        ----------
+        reading : Reading
+            reading of the controller, stale readings are ignored
+        rate : float, optional
+            rate set on the controller (°C/min)
+        limit : float, optional
+            limit set on the controller (°C)
+
+        Returns
+        -------
+        state : RampState
+            None until a reading with a temperature is received
+        """
+        T = reading.temperature
+        if reading.stale or T is None:
+            return self.state
+        t = reading.timestamp
+        slope = self.regression(t, T)
+        rate_measured = None if slope is None else slope*60
+        if rate_measured is not None:
+            if self.rate_ewma is None:
+                self.rate_ewma = rate_measured
+            else:
+                self.rate_ewma += self.alpha*(rate_measured - self.rate_ewma)
+        self.update_ramp(t, T, reading.SB1, rate, limit)
+        commanded = expected = error = lag = time_to_limit = rate_error = None
+        if self.ramp is not None:
+            t0, T0, ramp_rate, ramp_limit, direction = self.ramp
+            commanded = direction*ramp_rate
+            if reading.SB1 in LIMIT_REACHED:
+                expected = ramp_limit
+                excess = direction*(T - ramp_limit)
+                if self.overshoot is None or excess > self.overshoot:
+                    self.overshoot = excess
+                time_to_limit = 0.0
+            else:
+                expected = T0 + commanded*(t - t0)/60
+                if direction*(expected - ramp_limit) > 0:
+                    expected = ramp_limit
+                if ramp_rate > 0:
+                    lag = direction*(expected - T)/(ramp_rate/60)
+                remaining = ramp_limit - T
+                if self.rate_ewma is not None and remaining*self.rate_ewma > 0:
+                    time_to_limit = remaining/(self.rate_ewma/60)
+            error = T - expected
+            if self.rate_ewma is not None:
+                rate_error = self.rate_ewma - commanded
+        self.state = RampState(rate_measured, self.rate_ewma, commanded, rate_error,
+                               expected, error, lag, time_to_limit,
+                               None if self.ramp is None else self.overshoot)
+        self.accumulate(t, error, lag)
+        return self.state
+
+    def accumulate(self, t, error, lag):
+        # run summary, updated with each sample
+        self.count += 1
+        if self.t_first is None:
+            self.t_first = t
+        self.t_last = t
+        if self.rate_ewma is not None:
+            if self.max_rate is None or self.rate_ewma > self.max_rate:
+                self.max_rate = self.rate_ewma
+            if self.min_rate is None or self.rate_ewma < self.min_rate:
+                self.min_rate = self.rate_ewma
+        if error is not None:
+            self.max_abs_error = max(self.max_abs_error, abs(error))
+            self.sum_error2 += error*error
+            self.n_error += 1
+        if lag is not None:
+            self.sum_lag += lag
+            self.n_lag += 1
+        if self.overshoot is not None and (self.max_overshoot is None or self.overshoot > self.max_overshoot):
+            self.max_overshoot = self.overshoot
+
+    def summary(self):
+        """
+        statistics of the whole run, without going through the samples again
+
+        Returns
+        -------
+        summary : dict
+        """
+        return {'samples': self.count,
+                'duration_s': 0 if self.t_first is None else self.t_last - self.t_first,
+                'ramps': self.ramps,
+                'max_rate': self.max_rate,
+                'min_rate': self.min_rate,
+                'max_abs_tracking_error': self.max_abs_error if self.n_error else None,
+                'rms_tracking_error': math.sqrt(self.sum_error2/self.n_error) if self.n_error else None,
+                'mean_lag_s': self.sum_lag/self.n_lag if self.n_lag else None,
+                'max_overshoot': self.max_overshoot}
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio client for the programmer protocol, one event loop can drive many controllers.
+"""
+import asyncio
+import time
+
+from .PyLinkam import programmer, rate_command, limit_command, decode_reading, valid_T_reply
+
+
+class AsyncProgrammer(object):
+    """
+    asyncio version of programmer, running on an asyncio stream (reader, writer) pair
+    """
+    rate = None
+    limit = None
+    last_reading = None
+    latency = None # duration of the last query (s)
+    min_delay = programmer.min_delay
+    timeout = programmer.timeout
+    T_retries = programmer.T_retries # max number of 'T' queries sent again after an invalid reply
+
+    def __init__(self, reader, writer):
+        """
+        Parameters
+        ----------
+        reader : asyncio.StreamReader
+            stream receiving the replies of the controller
+        writer : asyncio.StreamWriter
+            stream sending the commands to the controller
+        """
+        self.reader = reader
+        self.writer = writer
+        self.lock = asyncio.Lock()
+        self.buffer = b''
+        self.last_write = 0
+        self.desync = False # a late reply may still arrive, see resync
+
+    @classmethod
+    async def open(cls, port):
+        """
+        open the serial connection with the controller (requires pyserial-asyncio)
+
+        Parameters
+        ----------
+        port : string
+            port to be used for serial communication with the controller
+
+        Returns
+        -------
+        prog : AsyncProgrammer
+        """
+        import serial
+        import serial_asyncio
+        reader, writer = await serial_asyncio.open_serial_connection(url=port,
+                                                                     baudrate=19200,
+                                                                     bytesize=8,
+                                                                     stopbits=serial.STOPBITS_ONE,
+                                                                     parity=serial.PARITY_NONE,
+                                                                     rtscts=1)
+        return cls(reader, writer)
+
+    async def read(self, timeout=None):
+        """
+        read a reply, up to the carriage return ending it
+
+        Parameters
+        ----------
+        timeout : float, optional
+            max time in seconds to wait for the reply. The default is the timeout attribute.
+
+        Returns
+        -------
+        answer : bytes
+            bytes read from the controller, incomplete if the timeout was reached
+        """
+        CR = b'\r'
+        if timeout is None:
+            timeout = self.timeout
+        deadline = time.monotonic() + timeout
+        while CR not in self.buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                chunk = await asyncio.wait_for(self.reader.read(64), remaining)
+            except asyncio.TimeoutError:
+                break
+            if not chunk: # connection closed
+                break
+            self.buffer += chunk
+        if CR not in self.buffer:
+            # the rest of the reply may come later, it must not be taken for the next one
+            self.desync = True
+        answer, _, self.buffer = self.buffer.partition(CR)
+        return answer
+
+    async def resync(self):
+        """
+        drop the bytes left from a late, partial or unexpected reply, waiting 
+        until nothing has been received for the timeout
+        """
+        self.buffer = b''
+        while True:
+            try:
+                chunk = await asyncio.wait_for(self.reader.read(1024), self.timeout)
+            except asyncio.TimeoutError:
+                break
+            if not chunk:
+                break
+        self.desync = False
+
+    async def write(self, command):
+        """
+        write a command, waiting for what is left of the min delay since the last command
+
+        Parameters
+        ----------
+        command : string
+            command to be passed to the controller
+        """
+        CR = "\r"
+        wait = self.last_write + self.min_delay - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        self.writer.write(bytes(command + CR, 'ascii'))
+        await self.writer.drain()
+        self.last_write = time.monotonic()
+
+    async def query(self, command, timeout=None):
+        """
+        write a command and read the reply.
+
+        Parameters
+        ----------
+        command : string
+            command to be passed to the controller
+        timeout : float, optional
+            max time in seconds to wait for the reply. The default is the timeout attribute.
+
+        Returns
+        -------
+        answer : bytes
+            one or more bytes
+        """
+        async with self.lock:
+            if self.desync or self.buffer:
+                await self.resync()
+            await self.write(command)
+            answer = await self.read(timeout)
+            self.latency = time.monotonic() - self.last_write
+            return answer
+
+    async def set_rate(self, rate):
+        """
+        set the heating or cooling rate of a ramp (°C/min, resolution 0.01°C/min)
+        """
+        command = rate_command(rate)
+        if command is not None:
+            await self.query(command)
+            self.rate = rate
+
+    async def set_limit(self, limit):
+        """
+        set the limit temperature of a ramp (°C, resolution 0.1°C)
+        """
+        command = limit_command(limit)
+        if command is not None:
+            await self.query(command)
+            self.limit = limit
+
+    async def start(self):
+        """
+        start heating or cooling at the rate specified in R1 and to the limit set by L1
+        """
+        await self.query('S')
+
+    async def stop(self):
+        """
+        stop heating or cooling
+        """
+        await self.query('E')
+
+    async def hold(self):
+        """
+        hold the current temperature
+        """
+        await self.query('O')
+
+    async def snapshot(self, timeout=None):
+        """
+        read temperature, status and error with a single 'T' query
+
+        Invalid replies are discarded with whatever is left of them, and the 
+        query is sent again, up to T_retries times.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            max time in seconds to wait for the reply. The default is the timeout attribute.
+
+        Returns
+        -------
+        reading : Reading
+            immutable and timestamped reading of the controller
+        """
+        for attempt in range(self.T_retries + 1):
+            if attempt > 0:
+                self.desync = True # drop the rest of a partial or late frame before querying again
+            T_bytes = await self.query('T', timeout)
+            if valid_T_reply(T_bytes):
+                break
+        else:
+            T_bytes = b''
+        reading = decode_reading(T_bytes, time.time(), self.last_reading)
+        self.last_reading = reading
+        return reading
+
+    async def close(self):
+        """
+        close the connection with the controller
+        """
+        self.writer.close()
+        if hasattr(self.writer, 'wait_closed'):
+            await self.writer.wait_closed()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the serial queries, decoding and logging, run against the simulator.
+
+Run from the command line to print the results as JSON:
+
+    python -m PyLinkam.Benchmark --output results.json
+
+and compare two result files to catch regressions:
+
+    python -m PyLinkam.Benchmark --compare old.json new.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from .PyLinkam import __version__, decode_reading, temperature_value
+from .Simulator import simulated_programmer
+
+T_REPLY = b'\x10\x80\x80\x80\x80\x80' + b'04B0' # heating, no error, 120.0°C
+
+
+def percentiles(values):
+    """
+    p50 and p99 of a list of values
+    """
+    values = sorted(values)
+    if not values:
+        return None, None
+    def p(q):
+        return values[min(len(values) - 1, int(q*len(values)))]
+    return p(0.5), p(0.99)
+
+
+def write_syscalls():
+    """
+    number of write system calls made by the process (Linux only, None elsewhere)
+    """
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('syscw:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def bench_query(n=200, latency=0.002):
+    """
+    round trip of the 'T' query
+
+    Returns
+    -------
+    results : dict
+        queries per second, p50 and p99 latency (s)
+    """
+    prog = simulated_programmer(latency=latency)
+    latencies = []
+    t0 = time.perf_counter()
+    for i in range(n):
+        prog.query('T')
+        latencies.append(prog.latency)
+    duration = time.perf_counter() - t0
+    p50, p99 = percentiles(latencies)
+    return {'queries_per_s': n/duration, 'latency_p50_s': p50, 'latency_p99_s': p99}
+
+
+def bench_decode(n=100000):
+    """
+    cost of decoding a 'T' reply
+
+    Returns
+    -------
+    results : dict
+        time per sample (s) to decode the temperature and the full reading
+    """
+    T_C_bytes = T_REPLY[6:10]
+    t0 = time.perf_counter()
+    for i in range(n):
+        temperature_value(T_C_bytes)
+    temperature = (time.perf_counter() - t0)/n
+    t0 = time.perf_counter()
+    for i in range(n):
+        decode_reading(T_REPLY, 0)
+    reading = (time.perf_counter() - t0)/n
+    return {'decode_temperature_s': temperature, 'decode_reading_s': reading}
+
+
+def legacy_csv_log(file, readings):
+    # csv logging as done before the Datalogger module: the file is opened for each sample
+    t0 = readings[0].timestamp
+    for reading in readings:
+        csv_file = open(file, "a")
+        csv_file.write(f"{reading.timestamp - t0}, {reading.temperature}, {reading.status}, {reading.error}\n")
+        csv_file.close()
+
+
+def bench_logging(n=20000):
+    """
+    cost of logging samples with the legacy csv loop and the Datalogger loggers
+
+    Returns
+    -------
+    results : dict
+        for each logger: samples per second, bytes per sample, bytes per second
+        and write system calls per sample (None if not available)
+    """
+    from .Datalogger import BinaryLogger, CSVLogger
+    reading = decode_reading(T_REPLY, time.time())
+    readings = [decode_reading(T_REPLY, reading.timestamp + i) for i in range(n)]
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for name in ('legacy_csv', 'csv', 'binary'):
+            file = os.path.join(folder, name)
+            syscw = write_syscalls()
+            t0 = time.perf_counter()
+            if name == 'legacy_csv':
+                legacy_csv_log(file, readings)
+            else:
+                Logger = CSVLogger if name == 'csv' else BinaryLogger
+                with Logger(file, capacity=n + 1, flush_interval=3600) as logger:
+                    for r in readings:
+                        logger.append(r)
+            duration = time.perf_counter() - t0
+            size = os.path.getsize(file)
+            syscalls = write_syscalls()
+            results[name] = {'samples_per_s': n/duration,
+                             'bytes_per_sample': size/n,
+                             'bytes_per_s': size/duration,
+                             'write_syscalls_per_sample': None if syscw is None else (syscalls - syscw)/n}
+    return results
+
+
+def bench_polling(n=50, latency=0.002):
+    """
+    full refresh of temperature, status and error: three properties against one snapshot
+
+    Returns
+    -------
+    results : dict
+        for each strategy: refreshes per second and queries per refresh
+    """
+    results = {}
+    for name in ('properties', 'snapshot'):
+        prog = simulated_programmer(latency=latency)
+        bytes_out = prog.ser.bytes_out
+        t0 = time.perf_counter()
+        for i in range(n):
+            if name == 'properties':
+                prog.temperature
+                prog.status
+                prog.error
+            else:
+                prog.snapshot()
+        duration = time.perf_counter() - t0
+        queries = (prog.ser.bytes_out - bytes_out)/len(b'T\r')
+        results[name] = {'refresh_per_s': n/duration, 'queries_per_refresh': queries/n}
+    return results
+
+
+def package_env():
+    # environment of a fresh interpreter importing this copy of the package
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = root + os.pathsep + env.get('PYTHONPATH', '')
+    return env
+
+
+def import_time(statement, n=5):
+    """
+    min wall time (s) of a fresh interpreter running statement
+    """
+    env = package_env()
+    times = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, '-c', statement], env=env, check=True)
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def bench_import(n=5):
+    """
+    cold start of 'import PyLinkam' against the floor of 'import serial'
+
+    Returns
+    -------
+    results : dict
+        interpreter start and import times (s), and the heavy modules
+        (numpy, PyQt5) loaded by 'import PyLinkam'
+    """
+    check = ("import sys, PyLinkam; "
+             "sys.exit(('numpy' in sys.modules) + 2*('PyQt5' in sys.modules))")
+    loaded = subprocess.run([sys.executable, '-c', check], env=package_env()).returncode
+    pyserial = import_time('import serial', n)
+    pylinkam = import_time('import PyLinkam', n)
+    return {'pyserial_s': pyserial,
+            'pylinkam_s': pylinkam,
+            'overhead_s': max(0, pylinkam - pyserial),
+            'heavy_modules': [name for bit, name in ((1, 'numpy'), (2, 'PyQt5')) if loaded & bit]}
+
+
+def run(quick=False, latency=0.002):
+    """
+    run all the benchmarks
+
+    Parameters
+    ----------
+    quick : bool, optional
+        run fewer iterations. The default is False.
+    latency : float, optional
+        reply latency of the simulated controller (s). The default is 0.002.
+
+    Returns
+    -------
+    results : dict
+        machine readable results
+    """
+    scale = 10 if quick else 1
+    return {'version': __version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': time.time(),
+            'query': bench_query(200//scale, latency),
+            'decode': bench_decode(100000//scale),
+            'logging': bench_logging(20000//scale),
+            'polling': bench_polling(50//scale, latency),
+            'import': bench_import(2 if quick else 5)}
+
+
+def flatten(results, prefix=''):
+    """
+    flat {'group.name': value} dict of the numeric results
+    """
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, prefix + key + '.'))
+        elif isinstance(value, (int, float)) and key != 'time':
+            flat[prefix + key] = value
+    return flat
+
+
+def compare(old, new, tolerance=0.2):
+    """
+    list the results that got worse by more than tolerance (relative)
+
+    Results named *_per_s are better when higher, the others when lower. 
+    Any heavy module loaded by 'import PyLinkam' is a regression.
+
+    Returns
+    -------
+    regressions : dict
+        {name: (old value, new value)}
+    """
+    regressions = {}
+    flat_old, flat_new = flatten(old), flatten(new)
+    for name, value in flat_new.items():
+        ref = flat_old.get(name)
+        if not ref or value is None:
+            continue
+        if name.endswith('_per_s'):
+            worse = value < ref*(1 - tolerance)
+        else:
+            worse = value > ref*(1 + tolerance)
+        if worse:
+            regressions[name] = (ref, value)
+    heavy = new.get('import', {}).get('heavy_modules')
+    if heavy:
+        regressions['import.heavy_modules'] = (old.get('import', {}).get('heavy_modules'), heavy)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='PyLinkam benchmarks')
+    parser.add_argument('--output', help='path of the json file to write the results to')
+    parser.add_argument('--quick', action='store_true', help='run fewer iterations')
+    parser.add_argument('--latency', type=float, default=0.002, help='reply latency of the simulator (s)')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two result files')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='relative tolerance of --compare')
+    args = parser.parse_args(argv)
+    if args.compare:
+        with open(args.compare[0]) as f:
+            old = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        regressions = compare(old, new, args.tolerance)
+        for name, (ref, value) in regressions.items():
+            if isinstance(value, list):
+                print(f'{name}: {ref} -> {value}')
+            else:
+                print(f'{name}: {ref:.6g} -> {value:.6g}')
+        return 1 if regressions else 0
+    results = run(args.quick, args.latency)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
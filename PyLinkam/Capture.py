@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+Capture of the raw frames exchanged with the controller, and their replay.
+
+A capture file starts with MAGIC and the offset between time.time() and
+time.monotonic() at the start of the capture, followed by one record per
+frame: monotonic time (float64), direction (uint8, REQUEST or REPLY),
+length (uint16) and the frame bytes, as written to or read from the port.
+"""
+import collections
+import mmap
+import os
+import struct
+import threading
+import time
+
+from .PyLinkam import decode_reading, decode_many, REQUEST, REPLY
+
+MAGIC = b'PYLKCAP1'
+HEADER = struct.Struct('<d')
+RECORD = struct.Struct('<dBH')
+
+
+class CaptureWriter(object):
+    """
+    append frames to a capture file
+    """
+    def __init__(self, file):
+        """
+        Parameters
+        ----------
+        file : string
+            path of the capture file, a new file is created
+        """
+        self.file = file
+        self.lock = threading.Lock()
+        self.fh = open(file, 'wb')
+        self.fh.write(MAGIC + HEADER.pack(time.time() - time.monotonic()))
+        self.frames = 0
+
+    def record(self, direction, data, t=None):
+        """
+        record a frame
+
+        Parameters
+        ----------
+        direction : int
+            REQUEST or REPLY
+        data : bytes
+            frame bytes
+        t : float, optional
+            monotonic time of the frame. The default is now.
+        """
+        if t is None:
+            t = time.monotonic()
+        with self.lock:
+            if self.fh.closed:
+                return
+            self.fh.write(RECORD.pack(t, direction, len(data)) + data)
+            self.frames += 1
+
+    def flush(self):
+        with self.lock:
+            self.fh.flush()
+
+    def close(self):
+        with self.lock:
+            self.fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_capture(file):
+    """
+    read the frames of a capture file
+
+    Parameters
+    ----------
+    file : string
+        path of the capture file
+
+    Returns
+    -------
+    offset : float
+        time.time() - time.monotonic() at the start of the capture
+    frames : list
+        (monotonic time, direction, bytes) of each frame
+    """
+    with open(file, 'rb') as f:
+        if os.path.getsize(file) == 0 or f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{file} is not a PyLinkam capture')
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            offset, = HEADER.unpack_from(data, len(MAGIC))
+            frames = []
+            i = len(MAGIC) + HEADER.size
+            end = len(data)
+            unpack = RECORD.unpack_from
+            size = RECORD.size
+            while i + size <= end:
+                t, direction, n = unpack(data, i)
+                i += size
+                frames.append((t, direction, data[i:i+n]))
+                i += n
+    return offset, frames
+
+
+def T_replies(frames):
+    """
+    (monotonic time, reply without the carriage return) of the replies to 'T' requests
+
+    Each reply answers the oldest request still waiting for its reply, the
+    commands of a batch being all sent before their replies are read.
+    """
+    replies = []
+    requests = collections.deque()
+    for t, direction, data in frames:
+        if direction == REQUEST:
+            requests.append(data)
+        elif requests and requests.popleft() == b'T\r':
+            replies.append((t, data[:-1] if data.endswith(b'\r') else data))
+    return replies
+
+
+def replay(file):
+    """
+    decode again, at full speed, the 'T' replies of a capture
+
+    Parameters
+    ----------
+    file : string
+        path of the capture file
+
+    Yields
+    ------
+    reading : Reading
+        timestamped with the time of the original reply
+    """
+    offset, frames = read_capture(file)
+    last = None
+    for t, reply in T_replies(frames):
+        last = decode_reading(reply, offset + t, last)
+        yield last
+
+
+def decode_capture(file):
+    """
+    decode all the 'T' replies of a capture into numpy arrays
+
+    Parameters
+    ----------
+    file : string
+        path of the capture file
+
+    Returns
+    -------
+    decoded : dict
+        'time' (float64, time.time() of the reply) and the arrays of decode_many
+    """
+    import numpy as np
+    offset, frames = read_capture(file)
+    replies = T_replies(frames)
+    decoded = decode_many([reply for t, reply in replies])
+    decoded['time'] = offset + np.array([t for t, reply in replies], dtype=np.float64)
+    return decoded
+
+
+class ReplayTransport(object):
+    """
+    serial-like transport replaying the replies of a capture file
+
+    Each write consumes the next request of the capture and queues the replies
+    recorded right after it (several ones after the last command of a batch),
+    each read returns the next queued reply. When the capture is exhausted,
+    is_open becomes False, which stops programmer.datalog.
+    """
+    def __init__(self, file, realtime=False, timeout=0):
+        """
+        Parameters
+        ----------
+        file : string
+            path of the capture file
+        realtime : bool, optional
+            deliver the replies with the timing of the capture, instead of 
+            as fast as possible. The default is False.
+        timeout : float, optional
+            kept for compatibility with serial.Serial. The default is 0.
+        """
+        self.offset, self.frames = read_capture(file)
+        self.realtime = realtime
+        self.timeout = timeout
+        self.index = 0
+        self.replies = collections.deque() # (monotonic time, reply) waiting to be read
+        self.start = None # monotonic time at which the replay started
+        self.is_open = len(self.frames) > 0
+        self.mismatches = 0 # commands that differ from the recorded requests
+
+    def write(self, data):
+        # move to the next recorded request
+        while self.index < len(self.frames) and self.frames[self.index][1] != REQUEST:
+            self.index += 1
+        if self.index >= len(self.frames):
+            self.is_open = False
+            return len(data)
+        t_request, _, request = self.frames[self.index]
+        if request != data:
+            self.mismatches += 1
+        self.index += 1
+        if self.realtime and self.start is None:
+            self.start = time.monotonic() - (t_request - self.frames[0][0])
+        while self.index < len(self.frames) and self.frames[self.index][1] == REPLY:
+            t_reply, _, reply = self.frames[self.index]
+            self.replies.append((t_reply, reply))
+            self.index += 1
+        if self.index >= len(self.frames):
+            self.is_open = False
+        return len(data)
+
+    def read_until(self, expected=b'\r', size=None):
+        if not self.replies:
+            return b''
+        t_reply, answer = self.replies.popleft()
+        if self.realtime:
+            # wait until the reply is due on the timeline of the capture
+            time.sleep(max(0, self.start + t_reply - self.frames[0][0] - time.monotonic()))
+        return answer
+
+    @property
+    def in_waiting(self):
+        return sum(len(reply) for t, reply in self.replies)
+
+    def reset_input_buffer(self):
+        self.replies.clear()
+
+    def close(self):
+        self.is_open = False
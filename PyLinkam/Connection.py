@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+Discovery of the controllers and connections that survive the loss of the port.
+
+discover() probes the serial ports in parallel with a 'T' query and keeps the
+ones giving a valid reply. connect() returns a programmer whose transport,
+ManagedSerial, reopens the port in the background with an exponential backoff
+when it fails (e.g. a USB-serial adapter dropping out), then sends the last
+rate and limit again. While the port is lost, the queries get no reply and
+the readings are marked as stale, so a datalog keeps running. Connections
+are kept by port: connecting again to the same port in the same process
+returns the same programmer, and discover() leaves these ports alone, as a
+'T' query would mix with the replies read by their programmer.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .PyLinkam import programmer, serial_port, valid_T_reply
+
+connections = {} # port: programmer opened by connect()
+connections_lock = threading.Lock()
+
+
+def candidate_ports():
+    """
+    names of the serial ports of the computer
+    """
+    from serial.tools import list_ports
+    return [info.device for info in list_ports.comports()]
+
+
+def ports_in_use():
+    """
+    ports held by the open connections of this process (see connect)
+    """
+    with connections_lock:
+        return {port for key, prog in connections.items() if prog.ser.is_open
+                for port in (key, prog.ser.port)}
+
+
+def probe(port, timeout=0.3, opener=serial_port):
+    """
+    check whether a Linkam controller answers on a port
+
+    Parameters
+    ----------
+    port : string
+        name of the port
+    timeout : float, optional
+        max time to wait for the reply (s). The default is 0.3.
+    opener : callable, optional
+        function opening the port, taking the port, baudrate and timeout.
+        The default is PyLinkam.serial_port.
+
+    Returns
+    -------
+    found : bool
+        True if the port gave a valid reply to the 'T' command
+    """
+    try:
+        ser = opener(port, programmer.baudrate, timeout)
+    except (OSError, ValueError):
+        return False
+    try:
+        ser.reset_input_buffer()
+        ser.write(b'T\r')
+        reply = ser.read_until(b'\r')
+        return reply.endswith(b'\r') and valid_T_reply(reply[:-1])
+    except (OSError, ValueError):
+        return False
+    finally:
+        ser.close()
+
+
+def discover(ports=None, timeout=0.3, opener=serial_port):
+    """
+    find the ports with a Linkam controller, probing all of them at the same time
+
+    The ports held by an open connection of this process (see connect) are 
+    not probed.
+
+    Parameters
+    ----------
+    ports : list, optional
+        ports to probe. The default is all the serial ports of the computer.
+    timeout : float, optional
+        max time to wait for the reply of each port (s). The default is 0.3.
+    opener : callable, optional
+        function opening a port (see probe).
+
+    Returns
+    -------
+    found : list
+        ports of the controllers, in the order of ports
+    """
+    if ports is None:
+        ports = candidate_ports()
+    in_use = ports_in_use()
+    ports = [port for port in ports if port not in in_use]
+    if not ports:
+        return []
+    with ThreadPoolExecutor(max_workers=min(32, len(ports))) as pool:
+        found = list(pool.map(lambda port: probe(port, timeout, opener), ports))
+    return [port for port, ok in zip(ports, found) if ok]
+
+
+class ManagedSerial(object):
+    """
+    serial-like transport reopening its port in the background when it fails
+    """
+    def __init__(self, port, timeout=programmer.timeout, backoff=0.5, max_backoff=30,
+                 rediscover=False, opener=serial_port):
+        """
+        Parameters
+        ----------
+        port : string
+            name of the port
+        timeout : float, optional
+            read timeout (s). The default is programmer.timeout.
+        backoff : float, optional
+            delay before the first reconnection attempt, doubled after each
+            failure (s). The default is 0.5.
+        max_backoff : float, optional
+            max delay between two attempts (s). The default is 30.
+        rediscover : bool, optional
+            when the port cannot be opened, look for the controller on the
+            other ports (the adapter may come back under another name).
+            The default is False.
+        opener : callable, optional
+            function opening the port (see probe).
+        """
+        self.port = port
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.rediscover = rediscover
+        self.opener = opener
+        self.controller = None # programmer replaying its rate and limit after a reconnection
+        self.lock = threading.Lock()
+        self.ser = opener(port, programmer.baudrate, timeout)
+        self.connected = True
+        self.is_open = True
+        self.thread = None
+        self.disconnects = 0
+        self.reconnects = 0
+        self.last_error = None
+
+    def lost(self, error):
+        # the port failed: close it and start reconnecting, once
+        with self.lock:
+            if not self.connected:
+                return
+            self.connected = False
+            self.disconnects += 1
+            self.last_error = error
+            try:
+                self.ser.close()
+            except Exception:
+                pass
+            if self.is_open:
+                self.thread = threading.Thread(target=self.reconnect, args=(), name=f'PyLinkam-reconnect-{self.port}')
+                self.thread.daemon = True
+                self.thread.start()
+
+    def open(self):
+        # open the port, or the port the controller moved to, with a 'T' handshake
+        ports = [self.port]
+        if self.rediscover:
+            # discover() skips the ports of the other connections
+            ports += [port for port in discover() if port != self.port]
+        for port in ports:
+            if probe(port, self.timeout*3, self.opener):
+                return port, self.opener(port, programmer.baudrate, self.timeout)
+        raise OSError(f'no controller found on {", ".join(ports)}')
+
+    def reconnect(self):
+        """
+        method run in the reconnection thread
+        """
+        delay = self.backoff
+        while self.is_open:
+            time.sleep(delay)
+            if not self.is_open:
+                return
+            try:
+                port, ser = self.open()
+            except OSError as e:
+                self.last_error = e
+                delay = min(self.max_backoff, 2*delay)
+                continue
+            with self.lock:
+                self.port, self.ser = port, ser
+                self.connected = True
+                self.reconnects += 1
+            print(f'reconnected to {port}')
+            self.restore()
+            return
+
+    def restore(self):
+        # send the last rate and limit again, the ramp itself is not restarted
+        controller = self.controller
+        if controller is None:
+            return
+        if controller.rate is not None:
+            controller.set_rate(controller.rate)
+        if controller.limit is not None:
+            controller.set_limit(controller.limit)
+
+    def write(self, data):
+        if self.connected:
+            try:
+                return self.ser.write(data)
+            except (OSError, ValueError) as e: # ValueError: port closed under our feet
+                self.lost(e)
+        return 0
+
+    def read_until(self, expected=b'\r', size=None):
+        if self.connected:
+            try:
+                return self.ser.read_until(expected, size)
+            except (OSError, ValueError) as e:
+                self.lost(e)
+        time.sleep(self.timeout) # like a read timeout
+        return b''
+
+    @property
+    def in_waiting(self):
+        try:
+            return self.ser.in_waiting if self.connected else 0
+        except (OSError, ValueError) as e:
+            self.lost(e)
+            return 0
+
+    def reset_input_buffer(self):
+        if self.connected:
+            try:
+                self.ser.reset_input_buffer()
+            except (OSError, ValueError) as e:
+                self.lost(e)
+
+    def close(self):
+        self.is_open = False
+        with self.lock:
+            self.connected = False
+            self.ser.close()
+        with connections_lock:
+            for port, prog in list(connections.items()):
+                if prog.ser is self:
+                    del connections[port]
+
+
+def connect(port=None, ports=None, backoff=0.5, max_backoff=30, rediscover=False, opener=serial_port):
+    """
+    programmer on a port that is reopened automatically when it fails
+
+    Parameters
+    ----------
+    port : string, optional
+        name of the port. The default is the first port where a controller is 
+        found, among the ports not connected yet (see discover).
+    ports : list, optional
+        ports searched when port is None. The default is all the serial ports.
+    backoff, max_backoff, rediscover, opener :
+        see ManagedSerial
+
+    Returns
+    -------
+    prog : programmer
+        the programmer already connected to this port, if any
+    """
+    if port is None:
+        found = discover(ports, opener=opener)
+        if not found:
+            raise OSError('no Linkam controller found')
+        port = found[0]
+    with connections_lock:
+        prog = connections.get(port)
+        if prog is not None and prog.ser.is_open:
+            return prog
+        transport = ManagedSerial(port, programmer.timeout, backoff, max_backoff, rediscover, opener)
+        prog = programmer(port, transport=transport)
+        transport.controller = prog
+        connections[port] = prog
+    return prog
@@ -0,0 +1,585 @@
+# -*- coding: utf-8 -*-
+"""
+Data logging engine: samples are stored in a preallocated ring buffer
+and written to file in batches by a background thread.
+"""
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from .PyLinkam import status_message, error_message
+
+# one sample: timestamp (time.time()), temperature (°C), status byte SB1, error byte EB1,
+# delay of the sample after its scheduled time (s)
+RECORD = np.dtype([('time', '<f8'),
+                   ('temperature', '<f4'),
+                   ('status', 'u1'),
+                   ('error', 'u1'),
+                   ('jitter', '<f4')])
+
+# first bytes of a binary log file
+MAGIC = b'PYLKLOG1'
+
+# one sample of an archive: timestamp, temperature, status byte SB1, error byte EB1,
+# rate (°C/min) and limit (°C) set on the controller when the sample was taken
+ARCHIVE_RECORD = np.dtype([('time', '<f8'),
+                           ('temperature', '<f4'),
+                           ('status', 'u1'),
+                           ('error', 'u1'),
+                           ('rate', '<f4'),
+                           ('limit', '<f4')])
+
+# first bytes of an archive, then chunks of CHUNK header + one compressed block per column
+ARCHIVE_MAGIC = b'PYLKCOL1'
+# t_min, t_max, number of samples, then the compressed size of each column
+CHUNK = struct.Struct('<ddI' + 'I'*len(ARCHIVE_RECORD.names))
+
+
+class RingBuffer(object):
+    """
+    fixed size buffer of samples, the oldest samples are overwritten when it is full
+    """
+    def __init__(self, capacity, dtype=RECORD):
+        """
+        Parameters
+        ----------
+        capacity : int
+            max number of samples kept in memory
+        dtype : numpy.dtype, optional
+            dtype of a sample. The default is RECORD.
+        """
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=dtype)
+        self.head = 0 # number of samples appended so far
+        self.tail = 0 # number of samples popped so far
+        self.dropped = 0 # number of samples overwritten before being popped
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.head - self.tail
+
+    def append(self, sample):
+        """
+        append a sample to the buffer
+
+        Parameters
+        ----------
+        sample : tuple
+            one value per field of the dtype
+        """
+        with self.lock:
+            if self.head - self.tail == self.capacity:
+                self.tail += 1
+                self.dropped += 1
+            self.data[self.head % self.capacity] = sample
+            self.head += 1
+
+    def pop_all(self):
+        """
+        remove all the samples from the buffer
+
+        Returns
+        -------
+        samples : numpy.ndarray
+            copy of the samples, oldest first
+        """
+        with self.lock:
+            start = self.tail % self.capacity
+            n = self.head - self.tail
+            if start + n <= self.capacity:
+                samples = self.data[start:start+n].copy()
+            else:
+                samples = np.concatenate((self.data[start:],
+                                          self.data[:start + n - self.capacity]))
+            self.tail = self.head
+        return samples
+
+
+class BinaryLogger(object):
+    """
+    logger writing samples as RECORD items in an append-only binary file
+
+    Samples are appended to a ring buffer and written to the file by a
+    background thread every flush_interval seconds, or sooner when the buffer
+    is half full. Use flush() to force the write and close() when done.
+    """
+    dtype = RECORD
+
+    def __init__(self, file, capacity=65536, flush_interval=1):
+        """
+        Parameters
+        ----------
+        file : string
+            path of the log file
+        capacity : int, optional
+            number of samples kept in memory. The default is 65536.
+        flush_interval : float, optional
+            max time in seconds between two writes. The default is 1.
+        """
+        self.file = file
+        self.flush_interval = flush_interval
+        self.buffer = RingBuffer(capacity, self.dtype)
+        self.write_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.closed = False
+        self.open()
+        self.thread = threading.Thread(target=self.run, args=())
+        self.thread.daemon = True
+        self.thread.start()
+
+    def open(self):
+        """
+        open the log file in append mode and write its header if it is new
+        """
+        new = not os.path.exists(self.file) or os.path.getsize(self.file) == 0
+        if not new:
+            with open(self.file, 'rb') as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    raise ValueError(f'{self.file} is not a PyLinkam binary log')
+        self.fh = open(self.file, 'ab')
+        if new:
+            self.fh.write(MAGIC)
+
+    def write(self, samples):
+        """
+        write a batch of samples to the file
+
+        Parameters
+        ----------
+        samples : numpy.ndarray
+            samples with the RECORD dtype
+        """
+        self.fh.write(samples.tobytes())
+
+    def append(self, reading, jitter=0):
+        """
+        log a reading
+
+        Parameters
+        ----------
+        reading : Reading
+            reading returned by programmer.snapshot()
+        jitter : float, optional
+            delay of the reading after its scheduled time (s). The default is 0.
+        """
+        SB1 = 0 if reading.SB1 is None else reading.SB1
+        EB1 = 0x80 if reading.EB1 is None else reading.EB1 # bit 7 is set by default
+        T_C = np.nan if reading.temperature is None else reading.temperature
+        self.append_sample(reading.timestamp, T_C, SB1, EB1, jitter)
+
+    def append_sample(self, timestamp, temperature, status, error, jitter=0):
+        """
+        log a sample
+
+        Parameters
+        ----------
+        timestamp : float
+            time of the sample (s)
+        temperature : float
+            temperature in °C
+        status : int
+            status byte SB1
+        error : int
+            error byte EB1
+        jitter : float, optional
+            delay of the sample after its scheduled time (s). The default is 0.
+        """
+        self.buffer.append((timestamp, temperature, status, error, jitter))
+        if len(self.buffer) >= self.buffer.capacity//2:
+            self.wake.set()
+
+    def run(self):
+        """
+        method run in the writer thread
+        """
+        while not self.closed:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            if not self.closed:
+                self.flush()
+
+    def flush(self):
+        """
+        write all the buffered samples to the file
+        """
+        with self.write_lock:
+            if self.fh.closed:
+                return
+            samples = self.buffer.pop_all()
+            if len(samples) > 0:
+                self.write(samples)
+            self.fh.flush()
+
+    def close(self):
+        """
+        stop the writer thread, write the remaining samples and close the file
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.wake.set()
+        if self.thread is not threading.current_thread():
+            self.thread.join()
+        self.flush()
+        with self.write_lock:
+            self.fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class CSVLogger(BinaryLogger):
+    """
+    logger writing samples as text in the csv format of programmer.datalog:
+    time since the first sample, temperature, status and error messages
+    """
+    t0 = None
+
+    def open(self):
+        self.fh = open(self.file, 'a')
+
+    def write(self, samples):
+        if self.t0 is None:
+            self.t0 = samples['time'][0]
+        self.fh.write(to_csv(samples, self.t0))
+
+
+class ArchiveLogger(BinaryLogger):
+    """
+    logger writing samples as compressed column chunks, for long runs
+
+    Each chunk holds chunk_size samples stored column by column (ARCHIVE_RECORD),
+    each column compressed with zlib, behind a header with the min and max
+    time of the chunk. Read it back with ArchiveReader. Samples waiting for
+    their chunk are written as a shorter chunk once the oldest of them is
+    chunk_interval seconds old, and when the logger is closed, so that a
+    crash loses at most chunk_interval seconds and the archive can be read
+    while the run goes on.
+    """
+    dtype = ARCHIVE_RECORD
+
+    def __init__(self, file, controller=None, chunk_size=4096, capacity=65536, flush_interval=1,
+                 chunk_interval=60):
+        """
+        Parameters
+        ----------
+        file : string
+            path of the archive
+        controller : programmer, optional
+            controller whose rate and limit are logged with each reading. The default is None.
+        chunk_size : int, optional
+            number of samples per chunk. The default is 4096.
+        capacity : int, optional
+            number of samples kept in memory. The default is 65536.
+        flush_interval : float, optional
+            max time in seconds between two writes. The default is 1.
+        chunk_interval : float, optional
+            max time in seconds a sample waits for its chunk to be written. 
+            The default is 60.
+        """
+        self.controller = controller
+        self.chunk_size = chunk_size
+        self.chunk_interval = chunk_interval
+        self.pending = [] # samples waiting for a full chunk
+        self.n_pending = 0
+        self.t_pending = None # monotonic time at which the oldest pending samples were written
+        super().__init__(file, capacity, flush_interval)
+
+    def open(self):
+        new = not os.path.exists(self.file) or os.path.getsize(self.file) == 0
+        if not new:
+            with open(self.file, 'rb') as f:
+                if f.read(len(ARCHIVE_MAGIC)) != ARCHIVE_MAGIC:
+                    raise ValueError(f'{self.file} is not a PyLinkam archive')
+        self.fh = open(self.file, 'ab')
+        if new:
+            self.fh.write(ARCHIVE_MAGIC)
+            self.fh.flush() # readable before the first chunk
+
+    def append(self, reading, jitter=0):
+        """
+        log a reading with the rate and limit of the controller
+
+        Parameters
+        ----------
+        reading : Reading
+            reading returned by programmer.snapshot()
+        jitter : float, optional
+            not stored, kept for compatibility with BinaryLogger. The default is 0.
+        """
+        SB1 = 0 if reading.SB1 is None else reading.SB1
+        EB1 = 0x80 if reading.EB1 is None else reading.EB1 # bit 7 is set by default
+        T_C = np.nan if reading.temperature is None else reading.temperature
+        rate = limit = None
+        if self.controller is not None:
+            rate, limit = self.controller.rate, self.controller.limit
+        self.append_sample(reading.timestamp, T_C, SB1, EB1, rate, limit)
+
+    def append_sample(self, timestamp, temperature, status, error, rate=None, limit=None):
+        """
+        log a sample
+
+        Parameters
+        ----------
+        timestamp : float
+            time of the sample (s)
+        temperature : float
+            temperature in °C
+        status : int
+            status byte SB1
+        error : int
+            error byte EB1
+        rate, limit : float, optional
+            rate (°C/min) and limit (°C) set on the controller, nan if None
+        """
+        self.buffer.append((timestamp, temperature, status, error,
+                            np.nan if rate is None else rate,
+                            np.nan if limit is None else limit))
+        if len(self.buffer) >= self.buffer.capacity//2:
+            self.wake.set()
+
+    def write(self, samples):
+        if self.n_pending == 0:
+            self.t_pending = time.monotonic()
+        self.pending.append(samples)
+        self.n_pending += len(samples)
+        if self.n_pending < self.chunk_size:
+            return
+        samples = np.concatenate(self.pending)
+        full = len(samples) - len(samples) % self.chunk_size
+        for i in range(0, full, self.chunk_size):
+            self.fh.write(pack_chunk(samples[i:i+self.chunk_size]))
+        self.pending = [samples[full:]]
+        self.n_pending = len(samples) - full
+        self.t_pending = time.monotonic()
+
+    def flush(self):
+        """
+        write the full chunks to the file, and the pending samples as a shorter 
+        chunk once they waited chunk_interval seconds or the logger is closed
+        """
+        super().flush()
+        with self.write_lock:
+            if (self.n_pending > 0 and not self.fh.closed 
+                    and (self.closed or time.monotonic() - self.t_pending >= self.chunk_interval)):
+                self.fh.write(pack_chunk(np.concatenate(self.pending)))
+                self.pending = []
+                self.n_pending = 0
+                self.fh.flush()
+
+
+def shuffle(column):
+    # group the n-th bytes of all the values together, which compresses much better
+    return np.ascontiguousarray(column.view(np.uint8).reshape(len(column), -1).T).tobytes()
+
+
+def unshuffle(data, dtype, n):
+    return np.frombuffer(data, dtype=np.uint8).reshape(dtype.itemsize, n).T.copy().view(dtype).ravel()
+
+
+def pack_chunk(samples):
+    """
+    chunk header and compressed columns of samples with the ARCHIVE_RECORD dtype
+    """
+    columns = [zlib.compress(shuffle(np.ascontiguousarray(samples[name])))
+               for name in ARCHIVE_RECORD.names]
+    header = CHUNK.pack(float(samples['time'].min()), float(samples['time'].max()),
+                        len(samples), *[len(c) for c in columns])
+    return header + b''.join(columns)
+
+
+class ArchiveReader(object):
+    """
+    time-range reads of an archive written by ArchiveLogger
+
+    The file is memory mapped and the chunk headers are read once to build
+    the index, only the chunks overlapping a requested range are decompressed.
+    """
+    def __init__(self, file):
+        """
+        Parameters
+        ----------
+        file : string
+            path of the archive
+        """
+        self.file = file
+        self.fh = open(file, 'rb')
+        if self.fh.read(len(ARCHIVE_MAGIC)) != ARCHIVE_MAGIC:
+            self.fh.close()
+            raise ValueError(f'{file} is not a PyLinkam archive')
+        self.data = mmap.mmap(self.fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self.index = self.read_index()
+
+    def read_index(self):
+        """
+        t_min, t_max, number of samples and offset of each chunk
+
+        Returns
+        -------
+        index : numpy.ndarray
+        """
+        index = []
+        i = len(ARCHIVE_MAGIC)
+        end = len(self.data)
+        while i + CHUNK.size <= end:
+            t_min, t_max, n, *sizes = CHUNK.unpack_from(self.data, i)
+            if i + CHUNK.size + sum(sizes) > end:
+                break # chunk being written
+            index.append((t_min, t_max, n, i))
+            i += CHUNK.size + sum(sizes)
+        return np.array(index, dtype=[('t_min', '<f8'), ('t_max', '<f8'),
+                                      ('n', '<u4'), ('offset', '<u8')])
+
+    def __len__(self):
+        return int(self.index['n'].sum())
+
+    def chunk(self, offset, columns):
+        # decompress some columns of the chunk at offset
+        t_min, t_max, n, *sizes = CHUNK.unpack_from(self.data, offset)
+        start = offset + CHUNK.size
+        decoded = {}
+        for name, size in zip(ARCHIVE_RECORD.names, sizes):
+            if name in columns:
+                dtype = ARCHIVE_RECORD.fields[name][0]
+                decoded[name] = unshuffle(zlib.decompress(self.data[start:start+size]), dtype, n)
+            start += size
+        return decoded
+
+    def read(self, start=None, end=None, columns=None):
+        """
+        read the samples taken between start and end
+
+        Parameters
+        ----------
+        start, end : float, optional
+            time range (time.time() values), both included. The default is the whole archive.
+        columns : list, optional
+            names of the columns to read. The default is all the columns.
+
+        Returns
+        -------
+        samples : dict
+            one numpy array per column
+        """
+        if columns is None:
+            columns = list(ARCHIVE_RECORD.names)
+        wanted = set(columns) | {'time'}
+        index = self.index
+        selected = np.ones(len(index), dtype=bool)
+        if start is not None:
+            selected &= index['t_max'] >= start
+        if end is not None:
+            selected &= index['t_min'] <= end
+        chunks = [self.chunk(int(offset), wanted) for offset in index['offset'][selected]]
+        if not chunks:
+            return {name: np.zeros(0, dtype=ARCHIVE_RECORD.fields[name][0]) for name in columns}
+        samples = {name: np.concatenate([c[name] for c in chunks]) for name in wanted}
+        t = samples['time']
+        keep = np.ones(len(t), dtype=bool)
+        if start is not None:
+            keep &= t >= start
+        if end is not None:
+            keep &= t <= end
+        return {name: samples[name][keep] for name in columns}
+
+    def close(self):
+        self.data.close()
+        self.fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_archive(file, start=None, end=None, columns=None):
+    """
+    read the samples of an archive taken between start and end (see ArchiveReader.read)
+    """
+    with ArchiveReader(file) as archive:
+        return archive.read(start, end, columns)
+
+
+def read_log(file):
+    """
+    read a binary log file without loading it in memory
+
+    Parameters
+    ----------
+    file : string
+        path of the binary log file
+
+    Returns
+    -------
+    samples : numpy.ndarray
+        memory mapped samples with the RECORD dtype
+    """
+    with open(file, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{file} is not a PyLinkam binary log')
+    n = (os.path.getsize(file) - len(MAGIC))//RECORD.itemsize
+    if n == 0:
+        return np.zeros(0, dtype=RECORD)
+    return np.memmap(file, dtype=RECORD, mode='r', offset=len(MAGIC), shape=(n,))
+
+
+def to_csv(samples, t0=None):
+    """
+    format samples as csv lines: time since t0, temperature, status, error
+
+    Parameters
+    ----------
+    samples : numpy.ndarray
+        samples with the RECORD dtype
+    t0 : float, optional
+        time origin. The default is the time of the first sample.
+
+    Returns
+    -------
+    text : string
+    """
+    if len(samples) == 0:
+        return ''
+    if t0 is None:
+        t0 = samples['time'][0]
+    # decode each distinct code only once
+    status = {s: status_message(s) for s in np.unique(samples['status']).tolist()}
+    # one line per error message in the controller message, joined to fit in a csv field
+    error = {e: '; '.join(m.strip() for m in error_message(e).splitlines())
+             for e in np.unique(samples['error']).tolist()}
+    delta_t = (samples['time'] - t0).tolist()
+    temperature = samples['temperature'].astype(np.float64).round(1).tolist()
+    lines = [f"{t}, {T}, {status[s]}, {error[e]}\n"
+             for t, T, s, e in zip(delta_t, temperature,
+                                   samples['status'].tolist(),
+                                   samples['error'].tolist())]
+    return ''.join(lines)
+
+
+def export(file, out):
+    """
+    export a binary log file to csv or parquet (requires pandas and pyarrow)
+
+    Parameters
+    ----------
+    file : string
+        path of the binary log file
+    out : string
+        path of the exported file, the format is chosen from its extension
+    """
+    samples = read_log(file)
+    if out.endswith('.parquet'):
+        import pandas as pd
+        pd.DataFrame({name: np.asarray(samples[name]) for name in RECORD.names}).to_parquet(out)
+    else:
+        with open(out, 'w') as f:
+            f.write(to_csv(samples))
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Bulk loading of the csv files written by programmer.datalog.
+
+Each line of these files holds the time since the first sample, the
+temperature, the status message and the error message, separated by ', '.
+A file is split into fields once, the numbers are converted one by one with
+float() straight into numpy arrays (np.fromiter), and the messages are turned
+back into the SB1 and EB1 codes once per distinct message. np.loadtxt would
+not save the split needed for the messages, and costs more than float() on
+the numeric columns. The files are parsed in parallel by a process pool into
+numpy arrays with the RECORD dtype of the binary logs.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .PyLinkam import STATUS, ERROR_MESSAGES
+from .Datalogger import RECORD, MAGIC, ARCHIVE_MAGIC, ARCHIVE_RECORD, pack_chunk
+
+STATUS_CODES = {message: SB1 for SB1, message in STATUS.items()}
+ERROR_CODES = {message.strip(): int(flag) for flag, message in ERROR_MESSAGES.items()}
+
+
+def status_code(message):
+    """
+    status byte SB1 of a status message, 0 if unknown
+    """
+    return STATUS_CODES.get(message.strip(), 0)
+
+
+def error_code(message):
+    """
+    error byte EB1 of an error message (messages separated by '; ' or new lines)
+    """
+    EB1 = 0x80 # bit 7 is set by default
+    for line in message.replace(';', '\n').splitlines():
+        EB1 |= ERROR_CODES.get(line.strip(), 0)
+    return EB1
+
+
+def codes(messages, code):
+    """
+    code of each message, computed once per distinct message
+
+    Parameters
+    ----------
+    messages : list
+        messages of the samples
+    code : callable
+        function giving the code of a message
+
+    Returns
+    -------
+    codes : numpy.ndarray
+        uint8 codes
+    """
+    table = {message: code(message) for message in set(messages)}
+    return np.fromiter(map(table.__getitem__, messages), dtype=np.uint8, count=len(messages))
+
+
+def split_lines(text):
+    # lines of the file, with the continuation lines of multi-line error messages
+    # joined to their sample
+    lines = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        if lines and line.count(', ') < 3:
+            lines[-1] += '\n' + line
+        else:
+            lines.append(line)
+    return lines
+
+
+def load_csv(file, t0=None):
+    """
+    load a csv file written by programmer.datalog
+
+    Parameters
+    ----------
+    file : string
+        path of the csv file
+    t0 : float, optional
+        time (time.time()) of the first sample. The csv files only hold the
+        time since the first sample, the default estimates t0 from the
+        modification time of the file, i.e. the time of its last sample.
+
+    Returns
+    -------
+    samples : numpy.ndarray
+        samples with the RECORD dtype, jitter is nan
+    """
+    with open(file, encoding='utf-8', errors='replace') as f:
+        text = f.read()
+    text = text.replace(', None, ', ', nan, ') # no temperature read
+    # fast path: a single split of the whole file when each line holds one sample
+    n = text.count('\n') + (len(text) > 0 and not text.endswith('\n'))
+    fields = text.replace('\n', ', ').split(', ')
+    if fields[-1] == '':
+        fields.pop()
+    if len(fields) != 4*n:
+        fields = [field for line in split_lines(text) for field in line.split(', ', 3)]
+        n = len(fields)//4
+    samples = np.zeros(n, dtype=RECORD)
+    if n == 0:
+        return samples
+    delta_t = np.fromiter(map(float, fields[0::4]), dtype=np.float64, count=n)
+    if t0 is None:
+        t0 = os.path.getmtime(file) - delta_t[-1]
+    samples['time'] = t0 + delta_t
+    samples['temperature'] = np.fromiter(map(float, fields[1::4]), dtype=np.float64, count=n)
+    samples['status'] = codes(fields[2::4], status_code)
+    samples['error'] = codes(fields[3::4], error_code)
+    samples['jitter'] = np.nan
+    return samples
+
+
+def load_many(files, processes=None):
+    """
+    load many csv files in parallel
+
+    Parameters
+    ----------
+    files : list
+        paths of the csv files
+    processes : int, optional
+        number of worker processes, 1 to load the files in this process.
+        The default is the number of CPUs.
+
+    Returns
+    -------
+    samples : numpy.ndarray
+        samples of all the files with the RECORD dtype, in the order of the files
+    file_index : numpy.ndarray
+        index in files of the file of each sample
+    """
+    parts = list(iter_load(files, processes))
+    if not parts:
+        return np.zeros(0, dtype=RECORD), np.zeros(0, dtype=np.int32)
+    file_index = np.repeat(np.arange(len(parts), dtype=np.int32), [len(p) for p in parts])
+    return np.concatenate(parts), file_index
+
+
+def iter_load(files, processes=None):
+    # samples of each file, in the order of the files
+    files = list(files)
+    if processes == 1 or len(files) < 2:
+        for file in files:
+            yield load_csv(file)
+        return
+    with ProcessPoolExecutor(processes) as pool:
+        for samples in pool.map(load_csv, files, chunksize=max(1, len(files)//64)):
+            yield samples
+
+
+def convert(files, out, processes=None, chunk_size=4096):
+    """
+    convert csv files into a single binary log, or an archive if out ends with .pylk
+
+    The files are parsed in parallel and written in their order, each one as
+    soon as it is loaded, so the whole set is never held in memory.
+
+    Parameters
+    ----------
+    files : list
+        paths of the csv files
+    out : string
+        path of the binary log (see Datalogger.read_log) or of the archive
+        (see Datalogger.ArchiveReader), overwritten if it exists
+    processes : int, optional
+        number of worker processes. The default is the number of CPUs.
+    chunk_size : int, optional
+        number of samples per chunk of an archive. The default is 4096.
+
+    Returns
+    -------
+    n : int
+        number of samples written
+    """
+    archive = out.endswith('.pylk')
+    n = 0
+    with open(out, 'wb') as f:
+        f.write(ARCHIVE_MAGIC if archive else MAGIC)
+        for samples in iter_load(files, processes):
+            if archive:
+                records = np.zeros(len(samples), dtype=ARCHIVE_RECORD)
+                for name in ('time', 'temperature', 'status', 'error'):
+                    records[name] = samples[name]
+                records['rate'] = np.nan # not logged in the csv files
+                records['limit'] = np.nan
+                for i in range(0, len(records), chunk_size):
+                    f.write(pack_chunk(records[i:i+chunk_size]))
+            else:
+                f.write(samples.tobytes())
+            n += len(samples)
+    return n
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+Counters and histograms of the serial I/O of a programmer.
+
+Metrics are off by default and cost a single attribute check per I/O call.
+Turn them on with programmer.enable_metrics(), read them with
+programmer.stats() and serve them to Prometheus with MetricsServer.
+"""
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# upper bounds of the histogram buckets (s): 0.1 ms to ~1.6 s
+BOUNDS = tuple(1e-4*2**k for k in range(15))
+
+COUNTERS = {'queries': "queries sent to the controller",
+            'empty_replies': "replies with no byte at all (timeout)",
+            'short_replies': "replies not ended by a carriage return (timeout)",
+            'stale_readings': "'T' queries whose reply could not be used, the last values were kept",
+            'retries': "queries sent again after an invalid reply",
+            'bytes_out': "bytes written to the controller",
+            'bytes_in': "bytes read from the controller"}
+
+HISTOGRAMS = {'round_trip': "time from the end of a write to the end of the reply (s)",
+              'write': "time spent writing a command, including the wait for the min delay (s)",
+              'read': "time spent reading a reply (s)",
+              'lock_wait': "time spent waiting for the lock of the programmer (s)"}
+
+
+class Histogram(object):
+    """
+    count of values per bucket, with their sum
+    """
+    def __init__(self, bounds=BOUNDS):
+        self.bounds = bounds
+        self.counts = [0]*(len(bounds) + 1) # the last bucket has no upper bound
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """
+        upper bound of the bucket holding the q quantile (max value for the last bucket)
+        """
+        if self.count == 0:
+            return None
+        rank = q*self.count
+        total = 0
+        for bound, n in zip(self.bounds, self.counts):
+            total += n
+            if total >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def stats(self):
+        return {'count': self.count,
+                'mean': self.sum/self.count if self.count else None,
+                'p50': self.quantile(0.5),
+                'p99': self.quantile(0.99),
+                'max': self.max}
+
+
+class Metrics(object):
+    """
+    counters and histograms of one programmer
+    """
+    def __init__(self, port=None):
+        """
+        Parameters
+        ----------
+        port : string, optional
+            port of the controller, used as a label by the exporter
+        """
+        self.port = port
+        self.lock = threading.Lock()
+        self.counters = {name: 0 for name in COUNTERS}
+        self.histograms = {name: Histogram() for name in HISTOGRAMS}
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+
+    def observe(self, name, value):
+        with self.lock:
+            self.histograms[name].observe(value)
+
+    def stats(self):
+        """
+        Returns
+        -------
+        stats : dict
+            counters, and count, mean, p50, p99 and max of each histogram
+        """
+        with self.lock:
+            stats = dict(self.counters)
+            for name, histogram in self.histograms.items():
+                stats[name] = histogram.stats()
+        return stats
+
+    def reset(self):
+        with self.lock:
+            self.counters = {name: 0 for name in COUNTERS}
+            self.histograms = {name: Histogram() for name in HISTOGRAMS}
+
+
+def prometheus_text(metrics):
+    """
+    Prometheus text exposition of a list of Metrics
+
+    Returns
+    -------
+    text : string
+    """
+    lines = []
+    for name, help in COUNTERS.items():
+        lines.append(f'# HELP pylinkam_{name}_total {help}')
+        lines.append(f'# TYPE pylinkam_{name}_total counter')
+        for m in metrics:
+            lines.append(f'pylinkam_{name}_total{{port="{m.port}"}} {m.counters[name]}')
+    for name, help in HISTOGRAMS.items():
+        lines.append(f'# HELP pylinkam_{name}_seconds {help}')
+        lines.append(f'# TYPE pylinkam_{name}_seconds histogram')
+        for m in metrics:
+            with m.lock:
+                h = m.histograms[name]
+                counts, count, total = list(h.counts), h.count, h.sum
+            cumulated = 0
+            for bound, n in zip(h.bounds + ('+Inf',), counts):
+                cumulated += n
+                le = bound if bound == '+Inf' else f'{bound:g}'
+                lines.append(f'pylinkam_{name}_seconds_bucket{{port="{m.port}",le="{le}"}} {cumulated}')
+            lines.append(f'pylinkam_{name}_seconds_sum{{port="{m.port}"}} {total}')
+            lines.append(f'pylinkam_{name}_seconds_count{{port="{m.port}"}} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        metrics = [c.metrics for c in self.server.controllers if c.metrics is not None]
+        body = prometheus_text(metrics).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer(object):
+    """
+    serve the metrics of programmers over http, for Prometheus
+    """
+    def __init__(self, controllers, address=('127.0.0.1', 9094)):
+        """
+        Parameters
+        ----------
+        controllers : list
+            programmers whose metrics are served (see programmer.enable_metrics)
+        address : tuple, optional
+            (host, port) of the http server. The default is ('127.0.0.1', 9094).
+        """
+        self.server = ThreadingHTTPServer(address, MetricsHandler)
+        self.server.daemon_threads = True
+        self.server.controllers = list(controllers)
+        self.address = self.server.server_address
+        self.thread = threading.Thread(target=self.server.serve_forever, args=())
+        self.thread.daemon = True
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
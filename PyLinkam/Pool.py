@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+Pool of controllers polled by one I/O thread per port, publishing their
+readings on a single thread-safe bus.
+"""
+import queue
+import threading
+from concurrent.futures import Future
+
+from .PyLinkam import programmer
+from .Timing import SampleClock
+
+
+class PoolWorker(threading.Thread):
+    """
+    thread owning the serial port of one controller: it runs the pending
+    commands first and polls the controller on a fixed time grid
+    """
+    def __init__(self, pool, device_id, controller, interval):
+        """
+        Parameters
+        ----------
+        pool : ControllerPool
+            pool receiving the readings
+        device_id : hashable
+            identifier of the controller in the pool
+        controller : programmer
+            controller polled by the thread
+        interval : float
+            time in seconds between two readings
+        """
+        super().__init__(name=f'PyLinkam-{device_id}')
+        self.daemon = True
+        self.pool = pool
+        self.device_id = device_id
+        self.controller = controller
+        self.clock = SampleClock(interval)
+        self.commands = queue.Queue()
+        self.lock = threading.Lock()
+        self.finished = False # no more commands are queued, they run from the calling thread
+        self.on = False
+
+    def submit(self, method, *args):
+        """
+        queue a call to a method of the controller
+
+        Parameters
+        ----------
+        method : string
+            name of the programmer method, e.g. 'hold' or 'set_rate'
+        *args :
+            arguments of the method
+
+        Returns
+        -------
+        future : concurrent.futures.Future
+            result of the call
+        """
+        future = Future()
+        with self.lock:
+            queued = self.is_alive() and not self.finished
+            if queued:
+                self.commands.put((future, method, args))
+        if not queued:
+            # not polling: run the command from the calling thread
+            self.execute(future, method, args)
+        return future
+
+    def execute(self, future, method, args):
+        # run a command and set the result of its future
+        if future.set_running_or_notify_cancel():
+            try:
+                future.set_result(getattr(self.controller, method)(*args))
+            except Exception as e:
+                future.set_exception(e)
+
+    def run(self):
+        self.on = True
+        try:
+            self.poll()
+        finally:
+            # the commands still queued (e.g. hold_all during stop) are run, not dropped
+            with self.lock:
+                self.finished = True
+            while True:
+                try:
+                    command = self.commands.get_nowait()
+                except queue.Empty:
+                    break
+                if command is not None:
+                    self.execute(*command)
+
+    def poll(self):
+        while self.on:
+            try:
+                command = self.commands.get(timeout=self.clock.time_left())
+            except queue.Empty:
+                command = None
+            if command is not None:
+                self.execute(*command)
+                continue
+            if not self.on:
+                break
+            self.clock.wait()
+            try:
+                reading = self.controller.snapshot()
+            except Exception as e:
+                self.pool.errors[self.device_id] = e
+                continue
+            self.pool.publish(self.device_id, reading)
+
+    def stop(self):
+        """Sets on flag to False and waits for thread to finish"""
+        self.on = False
+        self.commands.put(None)
+        self.join()
+
+
+class ControllerPool(object):
+    """
+    many controllers polled in parallel, one I/O thread per port
+
+    Readings are published as (device_id, reading) on the readings queue
+    and passed to the subscribed callbacks (called from the I/O threads).
+    """
+    def __init__(self, ports=None, interval=1, maxsize=10000):
+        """
+        Parameters
+        ----------
+        ports : dict or list, optional
+            {device_id: port} or list of ports used as device ids
+        interval : float, optional
+            time in seconds between two readings of each controller. The default is 1.
+        maxsize : int, optional
+            max number of readings waiting in the queue, the newest readings
+            are dropped when it is full. The default is 10000.
+        """
+        self.interval = interval
+        self.workers = {}
+        self.latest = {} # last reading of each controller
+        self.errors = {} # last exception raised while polling each controller
+        self.callbacks = []
+        self.readings = queue.Queue(maxsize)
+        self.dropped = 0
+        if ports is not None:
+            if not isinstance(ports, dict):
+                ports = {port: port for port in ports}
+            for device_id, port in ports.items():
+                self.add(device_id, port)
+
+    def add(self, device_id, controller):
+        """
+        add a controller to the pool
+
+        Parameters
+        ----------
+        device_id : hashable
+            identifier of the controller
+        controller : string or programmer
+            port of the controller, or programmer object
+        """
+        if device_id in self.workers:
+            raise ValueError(f'{device_id} is already in the pool')
+        if isinstance(controller, str):
+            controller = programmer(controller)
+        worker = PoolWorker(self, device_id, controller, self.interval)
+        self.workers[device_id] = worker
+        if self.running:
+            worker.start()
+
+    def __getitem__(self, device_id):
+        return self.workers[device_id].controller
+
+    def __len__(self):
+        return len(self.workers)
+
+    @property
+    def running(self):
+        return any(worker.is_alive() for worker in self.workers.values())
+
+    def subscribe(self, callback):
+        """
+        call a function with (device_id, reading) for each new reading
+
+        Parameters
+        ----------
+        callback : callable
+        """
+        self.callbacks.append(callback)
+
+    def unsubscribe(self, callback):
+        self.callbacks.remove(callback)
+
+    def publish(self, device_id, reading):
+        """
+        publish a reading on the bus (called by the I/O threads)
+        """
+        self.latest[device_id] = reading
+        try:
+            self.readings.put_nowait((device_id, reading))
+        except queue.Full:
+            self.dropped += 1
+        for callback in list(self.callbacks):
+            callback(device_id, reading)
+
+    def start(self):
+        """
+        start polling all the controllers
+        """
+        for worker in self.workers.values():
+            if not worker.is_alive():
+                worker.start()
+
+    def stop(self):
+        """
+        stop polling, the serial connections are left open
+        """
+        for device_id, worker in self.workers.items():
+            if worker.is_alive():
+                worker.stop()
+                # threads cannot be restarted, prepare a new one for the next start()
+                self.workers[device_id] = PoolWorker(self, device_id, worker.controller, self.interval)
+
+    def close(self):
+        """
+        stop polling and close all the serial connections
+        """
+        self.stop()
+        for worker in self.workers.values():
+            worker.controller.ser.close()
+
+    def submit(self, device_id, method, *args):
+        """
+        run a programmer method on one controller, from its I/O thread
+
+        Returns
+        -------
+        future : concurrent.futures.Future
+        """
+        return self.workers[device_id].submit(method, *args)
+
+    def broadcast(self, method, *args, wait=True):
+        """
+        run a programmer method on all the controllers at once
+
+        Parameters
+        ----------
+        method : string
+            name of the programmer method, e.g. 'hold' or 'set_rate'
+        *args :
+            arguments of the method
+        wait : bool, optional
+            wait for all the controllers to run the command. The default is True.
+
+        Returns
+        -------
+        futures : dict
+            {device_id: concurrent.futures.Future}
+        """
+        futures = {device_id: worker.submit(method, *args)
+                   for device_id, worker in self.workers.items()}
+        if wait:
+            for future in futures.values():
+                future.exception()
+        return futures
+
+    def hold_all(self):
+        return self.broadcast('hold')
+
+    def stop_all(self):
+        return self.broadcast('stop')
+
+    def start_all(self):
+        return self.broadcast('start')
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Multi-segment thermal programs run in a background thread.
+
+The programmer only knows a single ramp: a rate and a limit. A Profile
+chains segments (rate, limit, dwell) and moves to the next segment when the
+readings of the controller show that the limit is reached (SB1 = 30H or 40H),
+then the dwell time is over. Only the readings of 'T' commands written after
+the start command of the segment are taken into account (Reading.sequence),
+so a 30H left from the previous segment cannot end the next one. The readings come from whatever already polls
+the controller (datalog, ControllerPoller, ControllerPool...) through
+programmer.add_listener, the profile itself does not send 'T' queries.
+"""
+import queue
+import threading
+import time
+
+LIMIT_REACHED = (0x30, 0x40) # SB1 values when the controller holds at the limit
+
+
+class Segment(object):
+    """
+    ramp at a rate to a limit, then hold the limit for a dwell time
+    """
+    def __init__(self, rate, limit, dwell=0):
+        """
+        Parameters
+        ----------
+        rate : float
+            heating or cooling rate (°C/min)
+        limit : float
+            limit temperature (°C)
+        dwell : float, optional
+            time in seconds to hold the limit once reached. The default is 0.
+        """
+        self.rate = rate
+        self.limit = limit
+        self.dwell = dwell
+
+    def __repr__(self):
+        return f'Segment(rate={self.rate}, limit={self.limit}, dwell={self.dwell})'
+
+
+class Profile(object):
+    """
+    run a list of segments on a controller in a background thread
+
+    Call start() to run it, pause(), resume() and abort() to control it and
+    wait() to block until it is over. The timing of each segment is kept in
+    the timings list.
+    """
+    def __init__(self, controller, segments, on_segment=None, verbose=True):
+        """
+        Parameters
+        ----------
+        controller : programmer
+            controller running the profile, it has to be polled by something else
+            (datalog, ControllerPoller, ControllerPool...)
+        segments : list
+            Segment objects, or (rate, limit, dwell) tuples
+        on_segment : callable, optional
+            function called with (index, segment, timing) at the end of each segment
+        verbose : bool, optional
+            print the progress of the profile. The default is True.
+        """
+        self.controller = controller
+        self.segments = [s if isinstance(s, Segment) else Segment(*s) for s in segments]
+        self.on_segment = on_segment
+        self.verbose = verbose
+        self.readings = queue.Queue()
+        self.paused = threading.Event()
+        self.aborted = threading.Event()
+        self.timings = []
+        self.index = None # index of the running segment
+        self.thread = None
+        self.error = None # exception that stopped the profile
+
+    def listener(self, reading):
+        self.readings.put(reading)
+
+    def start(self):
+        """
+        start the profile in a background thread
+        """
+        self.aborted.clear()
+        self.paused.clear()
+        self.controller.add_listener(self.listener)
+        self.thread = threading.Thread(target=self.run, args=())
+        self.thread.daemon = True
+        self.thread.start()
+
+    def pause(self):
+        """
+        hold the current temperature, the dwell time stops running
+        """
+        self.paused.set()
+        self.controller.hold()
+        if self.verbose:
+            print('profile paused')
+
+    def resume(self):
+        """
+        go on with the running segment
+        """
+        if not self.paused.is_set():
+            return
+        self.controller.start()
+        self.paused.clear()
+        if self.verbose:
+            print('profile resumed')
+
+    def abort(self):
+        """
+        stop the controller and the profile
+        """
+        self.aborted.set()
+        self.controller.stop()
+        if self.verbose:
+            print('profile aborted')
+
+    def wait(self, timeout=None):
+        """
+        wait for the end of the profile
+
+        Returns
+        -------
+        done : bool
+            False if the timeout was reached before the end
+        """
+        if self.thread is None:
+            return True
+        self.thread.join(timeout)
+        return not self.thread.is_alive()
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def next_reading(self, timeout):
+        try:
+            return self.readings.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def wait_limit(self, sequence):
+        # wait for a reading of the limit being reached, answering a 'T' command
+        # written after the command number sequence. Stale readings only repeat
+        # the status of the last valid one.
+        while not self.aborted.is_set():
+            reading = self.next_reading(0.1)
+            if reading is None or self.paused.is_set() or reading.stale:
+                continue
+            if (reading.sequence is not None and reading.sequence > sequence
+                    and reading.SB1 in LIMIT_REACHED):
+                return True
+        return False
+
+    def wait_dwell(self, dwell):
+        # wait for the dwell time, not counting the time spent paused
+        remaining = dwell
+        last = time.monotonic()
+        while remaining > 0:
+            if self.aborted.wait(min(remaining, 0.1)):
+                return False
+            now = time.monotonic()
+            if not self.paused.is_set():
+                remaining -= now - last
+            last = now
+        return not self.aborted.is_set()
+
+    def run(self):
+        """
+        method run in the profile thread
+        """
+        try:
+            for self.index, segment in enumerate(self.segments):
+                t_start = time.time()
+                if self.verbose:
+                    print(f'segment {self.index}: {segment}')
+                self.controller.set_rate(segment.rate)
+                self.controller.set_limit(segment.limit)
+                self.controller.start()
+                # readings of 'T' commands written before the start command are outdated,
+                # whenever they reach the listener
+                if not self.wait_limit(self.controller.sequence):
+                    break
+                t_limit = time.time()
+                if not self.wait_dwell(segment.dwell):
+                    break
+                timing = {'segment': self.index,
+                          'start': t_start,
+                          'limit_reached': t_limit,
+                          'end': time.time(),
+                          'ramp_duration': t_limit - t_start}
+                self.timings.append(timing)
+                if self.verbose:
+                    print(f'segment {self.index} done in {timing["end"] - t_start:.1f} s '
+                          f'(ramp {timing["ramp_duration"]:.1f} s)')
+                if self.on_segment is not None:
+                    self.on_segment(self.index, segment, timing)
+        except Exception as e:
+            self.error = e
+            raise
+        finally:
+            self.controller.remove_listener(self.listener)
+        if self.verbose and not self.aborted.is_set():
+            print('profile done')
@@ -1,9 +1,424 @@
 __version__ = '1.0.0'
+import contextlib
+import enum
+import functools
 import serial
 import threading
 from time import sleep
 import time
 
+# direction of the frames recorded by programmer.capture
+REQUEST = 0
+REPLY = 1
+
+# commands whose reply contains data, the others are only acknowledged with a carriage return
+DATA_COMMANDS = ('T', 'D', 'M?', 'Mp')
+
+MAX_RATE = 15 #°C/min
+MAX_LIMIT = 1400 #°C
+
+T_REPLY_LENGTH = 10 # SB1, EB1, PB1, GS1, 2 unused bytes, 4 temperature bytes
+HEX_DIGITS = frozenset(b'0123456789abcdefABCDEF')
+
+
+def rate_command(rate):
+    """
+    command setting the heating or cooling rate of a ramp
+
+    Parameters
+    ----------
+    rate : float
+        °C/min, resolution 0.01°C/min
+
+    Returns
+    -------
+    command : string
+        command to be passed to the controller, None if the rate is out of range
+
+    """
+    if rate < MAX_RATE:
+        return 'R1%d' % (rate*100)
+    print(f'max rate is {MAX_RATE} °C/min')
+    return None
+
+
+def limit_command(limit):
+    """
+    command setting the limit temperature of a ramp
+
+    Parameters
+    ----------
+    limit : float
+        °C, resolution 0.1°C
+
+    Returns
+    -------
+    command : string
+        command to be passed to the controller, None if the limit is out of range
+
+    """
+    if limit < MAX_LIMIT:
+        return 'L1%d' % (limit*10)
+    print(f'max. limit is {MAX_LIMIT}°C')
+    return None
+
+
+def temperature_value(T_C_bytes):
+    """
+    temperature corresponding to the temperature bytes of a 'T' reply
+
+    Parameters
+    ----------
+    T_C_bytes : bytes
+        bytes 6 to 9 of the 'T' reply: temperature*10 as a signed ASCII hex value
+
+    Returns
+    -------
+    T_C : float
+        temperature in °C
+
+    """
+    T = int(T_C_bytes, 16)
+    if T >= 0x8000: # negative temperature (two's complement)
+        T -= 0x10000
+    return T/10
+
+
+def valid_T_reply(T_bytes):
+    """
+    check the frame of a reply to the 'T' command
+
+    Parameters
+    ----------
+    T_bytes : bytes
+        reply of the controller without the carriage return
+
+    Returns
+    -------
+    valid : bool
+        True if the reply has 10 bytes and its temperature bytes are hex digits
+    """
+    return (len(T_bytes) == T_REPLY_LENGTH 
+            and all(b in HEX_DIGITS for b in T_bytes[6:10]))
+
+
+# status messages according to the documentation
+STATUS = {0x01: 'stopped', 
+          0x10: 'heating', 
+          0x20: 'cooling', 
+          0x30: 'holding at the limit or limit reached end of a ramp', 
+          0x40: 'holding the limit time', 
+          0x50: 'holding the current temperature'}
+
+
+def status_message(SB1):
+    """
+    status message corresponding to a status byte
+
+    Parameters
+    ----------
+    SB1 : int
+        status byte returned by the controller
+
+    Returns
+    -------
+    status : string
+        status of the controller according to the documentation 
+
+    """
+    return STATUS.get(SB1, 'problem reading SB1')
+
+
+class ErrorFlag(enum.IntFlag):
+    """
+    bits of the error byte EB1
+    """
+    COOLING_RATE = 0x01 # cooling rate too fast
+    OPEN_CIRCUIT = 0x02 # stage not connected or sensor is open circuit
+    POWER_SURGE = 0x04 # current protection set due to an overload
+    NO_EXIT_300 = 0x08 # TS1500 tried to exit profile at a temperature > 300°C
+    BOTH_STAGES = 0x10 # TMS92 has a TS1500 and a THM stage connected
+    LINK_ERROR = 0x20 # problems with the RS232 data transmission
+
+
+ERROR_MASK = 0x3F # bit 6 is not connected, bit 7 is set by default
+
+ERROR_MESSAGES = {ErrorFlag.COOLING_RATE: 'Cooling rate cannot be maintained \n', 
+                  ErrorFlag.OPEN_CIRCUIT: 'Stage not connected or sensor is open circuit \n', 
+                  ErrorFlag.POWER_SURGE: 'Current protection has been set due to an overload \n', 
+                  ErrorFlag.NO_EXIT_300: 'TS1500 stage tried to exit profile at a temperature > 300°C (not allowed)\n', 
+                  ErrorFlag.BOTH_STAGES: 'TMS92 has a TS1500 and THM stage connected (not allowed)\n', 
+                  ErrorFlag.LINK_ERROR: 'Problems with the RS232 data transmission\n'}
+
+
+def error_flags(EB1):
+    """
+    error flags set in an error byte
+
+    Parameters
+    ----------
+    EB1 : int
+        error byte returned by the controller
+
+    Returns
+    -------
+    flags : ErrorFlag
+        ErrorFlag(0) if there is no error
+
+    """
+    return ErrorFlag(EB1 & ERROR_MASK)
+
+
+# error message of every combination of error bits
+ERROR_TABLE = [''.join(message for flag, message in ERROR_MESSAGES.items() if bits & flag) or 'no error'
+               for bits in range(ERROR_MASK + 1)]
+
+
+def error_message(EB1):
+    """
+    error message corresponding to an error byte
+
+    Parameters
+    ----------
+    EB1 : int
+        error byte returned by the controller
+
+    Returns
+    -------
+    message : string
+        error messages according to the documentation, one per line
+
+    """
+    return ERROR_TABLE[EB1 & ERROR_MASK]
+
+
+@functools.lru_cache(maxsize=None)
+def hex_table():
+    """
+    numpy table of the value of each ASCII hex digit, -1 for other bytes
+    """
+    import numpy as np
+    table = np.full(256, -1, dtype=np.int32)
+    for i, c in enumerate(b'0123456789ABCDEF'): 
+        table[c] = i
+    for i, c in enumerate(b'abcdef'): 
+        table[c] = 10 + i
+    return table
+
+
+def decode_many(replies):
+    """
+    decode a batch of 'T' replies into numpy arrays (requires numpy)
+
+    Parameters
+    ----------
+    replies : list of bytes or numpy.ndarray
+        replies without the carriage return, or uint8 array of shape (n, 10)
+
+    Returns
+    -------
+    decoded : dict
+        'temperature' (float32, °C, nan for invalid replies), 'status' (uint8 SB1), 
+        'error' (uint8 EB1) and 'valid' (bool) arrays of length n
+
+    """
+    import numpy as np
+    if isinstance(replies, np.ndarray): 
+        data = replies.reshape(-1, 10).astype(np.uint8, copy=False)
+        valid = np.ones(len(data), dtype=bool)
+    else: 
+        valid = np.fromiter((len(r) == 10 for r in replies), dtype=bool, count=len(replies))
+        data = np.zeros((len(replies), 10), dtype=np.uint8)
+        if valid.any(): 
+            joined = b''.join(r for r, v in zip(replies, valid) if v)
+            data[valid] = np.frombuffer(joined, dtype=np.uint8).reshape(-1, 10)
+    digits = hex_table()[data[:, 6:10]]
+    valid &= (digits >= 0).all(axis=1)
+    T = (digits[:, 0] << 12) | (digits[:, 1] << 8) | (digits[:, 2] << 4) | digits[:, 3]
+    T = np.where(T >= 0x8000, T - 0x10000, T)
+    temperature = (T/10).astype(np.float32)
+    temperature[~valid] = np.nan
+    return {'temperature': temperature, 
+            'status': data[:, 0].copy(), 
+            'error': data[:, 1].copy(), 
+            'valid': valid}
+
+
+class Reading(object):
+    """
+    immutable reading of the controller decoded from a single 'T' reply
+    
+    Attributes
+    ----------
+    timestamp : float
+        time (time.time()) at which the reply was received
+    raw : bytes
+        raw bytes returned by the controller
+    temperature : float
+        temperature in °C
+    status : string
+        status message decoded from SB1
+    error : string
+        error message decoded from EB1
+    SB1 : int
+        status byte
+    EB1 : int
+        error byte
+    stale : bool
+        True if the controller gave no valid reply, the values are those of 
+        the previous reading (or None)
+    sequence : int
+        number of the 'T' command answered by the reply (programmer.sequence), 
+        orders the reading with the other commands sent to the controller
+    analytics : Analytics.RampState
+        measured rate and ramp tracking, None unless programmer.enable_analytics was called
+    """
+    __slots__ = ('timestamp', 'raw', 'temperature', 'status', 'error', 'SB1', 'EB1', 'stale', 
+                 'sequence', 'analytics')
+    
+    def __init__(self, timestamp, raw, temperature, status, error, SB1=None, EB1=None, stale=False, 
+                 sequence=None, analytics=None):
+        object.__setattr__(self, 'timestamp', timestamp)
+        object.__setattr__(self, 'raw', raw)
+        object.__setattr__(self, 'temperature', temperature)
+        object.__setattr__(self, 'status', status)
+        object.__setattr__(self, 'error', error)
+        object.__setattr__(self, 'SB1', SB1)
+        object.__setattr__(self, 'EB1', EB1)
+        object.__setattr__(self, 'stale', stale)
+        object.__setattr__(self, 'sequence', sequence)
+        object.__setattr__(self, 'analytics', analytics)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError('Reading objects are immutable')
+    
+    def __delattr__(self, name):
+        raise AttributeError('Reading objects are immutable')
+    
+    def replace(self, **changes): 
+        """
+        copy of the reading with some values changed, e.g. reading.replace(analytics=state)
+        """
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values.update(changes)
+        return Reading(**values)
+    
+    def __reduce__(self): 
+        # rebuilt through __init__, __setattr__ being disabled (pickle, copy, multiprocessing)
+        return Reading, tuple(getattr(self, name) for name in self.__slots__)
+    
+    def __eq__(self, other): 
+        if not isinstance(other, Reading): 
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+    
+    def __hash__(self): 
+        return hash(tuple(getattr(self, name) for name in self.__slots__))
+    
+    @property
+    def error_flags(self):
+        """
+        error flags decoded from EB1 (ErrorFlag)
+        """
+        if self.EB1 is None: 
+            return None
+        return error_flags(self.EB1)
+    
+    def __repr__(self):
+        return (f'Reading(timestamp={self.timestamp}, temperature={self.temperature}, '
+                f'status={self.status!r}, error={self.error!r}'
+                + (', stale=True)' if self.stale else ')'))
+
+
+def decode_reading(T_bytes, timestamp, last=None, sequence=None):
+    """
+    decode the reply to the 'T' command
+
+    Parameters
+    ----------
+    T_bytes : bytes
+        reply of the controller without the carriage return
+    timestamp : float
+        time at which the reply was received
+    last : Reading, optional
+        previous reading, whose values are used again if the reply is empty 
+        or invalid (see valid_T_reply)
+    sequence : int, optional
+        number of the 'T' command answered by the reply
+
+    Returns
+    -------
+    reading : Reading
+        marked as stale if the reply was empty or invalid
+
+    """
+    if valid_T_reply(T_bytes): 
+        SB1, EB1 = T_bytes[0], T_bytes[1]
+        return Reading(timestamp, bytes(T_bytes), temperature_value(T_bytes[6:10]), 
+                       status_message(SB1), error_message(EB1), SB1, EB1, sequence=sequence)
+    if last is not None: 
+        return Reading(timestamp, bytes(T_bytes), last.temperature, last.status, last.error, 
+                       last.SB1, last.EB1, stale=True, sequence=sequence)
+    return Reading(timestamp, bytes(T_bytes), None, status_message(None), 'problem reading EB1', 
+                   stale=True, sequence=sequence)
+
+
+def serial_port(port, baudrate=19200, timeout=0.1): 
+    """
+    open a serial port with the settings of the controller (8N1, RTS/CTS)
+
+    Parameters
+    ----------
+    port : string
+        name of the port
+    baudrate : int, optional
+        The default is 19200.
+    timeout : float, optional
+        max time to wait for a reply (s). The default is 0.1.
+
+    Returns
+    -------
+    ser : serial.Serial
+    """
+    return serial.Serial(port=port,
+                         baudrate=baudrate,
+                         bytesize=8,
+                         stopbits = serial.STOPBITS_ONE,         
+                         timeout=timeout,
+                         parity=serial.PARITY_NONE,
+                         rtscts=1)
+
+
+class Batch(object):
+    """
+    commands sent back to back by programmer.batch
+    
+    Attributes
+    ----------
+    commands : list
+        commands sent during the batch
+    acks : list
+        one bool per command, True if it was acknowledged by the controller
+    delay : float
+        min time in seconds between two commands of the batch
+    thread : threading.Thread
+        thread sending the batch
+    """
+    def __init__(self, delay): 
+        self.delay = delay
+        self.commands = []
+        self.acks = []
+        self.thread = threading.current_thread()
+    
+    @property
+    def ok(self): 
+        """True if all the commands were acknowledged"""
+        return all(self.acks) and len(self.acks) == len(self.commands)
+    
+    def __repr__(self): 
+        return f'Batch({list(zip(self.commands, self.acks))})'
+
+
 class programmer(object):
     """ 
     Serial communication via RS232 for
@@ -19,7 +434,19 @@ class programmer(object):
     T_C = None 
     rate = None
     limit = None
-    def __init__(self, port):
+    last_reading = None
+    recorder = None # Capture.CaptureWriter recording the frames
+    latency = None # duration of the last query (s)
+    batching = None # Batch of commands being sent by programmer.batch
+    metrics = None # Metrics.Metrics of the serial I/O, see enable_metrics
+    T_retries = 2 # max number of 'T' queries sent again after an invalid reply
+    analytics = None # Analytics.RampTracker fed by snapshot, see enable_analytics
+    run_summary = None # summary of the analytics at the end of the last datalog
+    scheduler = None # Scheduler.CommandScheduler running the queries, see enable_scheduler
+    baudrate = 19200
+    min_delay = 0.008 # min delay between two commands (s), 8 ms according to documentation
+    timeout = 0.1 # max time to wait for the carriage return ending a reply (s)
+    def __init__(self, port=None, transport=None):
         """
         programmer object creator
 
@@ -27,15 +454,19 @@ class programmer(object):
         ----------
         port : string
             port to be used for serial communication with the controller
+        transport : serial-like object, optional
+            object used instead of a serial port, with the write, read_until, 
+            close methods and the is_open attribute of serial.Serial 
+            (e.g. Simulator.SimulatedSerial). The default is None.
         """
-        self.lock = threading.Lock()
-        self.ser = serial.Serial(port=port,
-                                baudrate=19200,
-                                bytesize=8,
-                                stopbits = serial.STOPBITS_ONE,         
-                                timeout=0.01,
-                                parity=serial.PARITY_NONE,
-                                rtscts=1)
+        self.lock = threading.RLock()
+        self.last_write = 0
+        self.sequence = 0 # number of commands written so far
+        self.port = port
+        self.listeners = []
+        if transport is None: 
+            transport = serial_port(port, self.baudrate, self.timeout)
+        self.ser = transport
         #self.get_T_bytes()
         # initialize limit and rate 
         #self.set_limit(1)
@@ -43,7 +474,10 @@ class programmer(object):
         
     def read(self):
         """
-        Serial read 
+        Serial read of a reply. 
+        
+        Returns as soon as the carriage return ending the reply is received, 
+        or after the timeout if the reply is incomplete.
 
         Returns
         -------
@@ -51,10 +485,40 @@ class programmer(object):
             bytes read from the controller
 
         """
-        answer = self.ser.readline()[0:-1] #last byte is a carriage return (useless)
-        return answer
+        return self.read_reply()[0]
+    
+    def read_reply(self):
+        """
+        Serial read of a reply, telling whether it was complete.
+
+        Returns
+        -------
+        answer: bytes
+            bytes read from the controller, without the carriage return
+        complete : bool
+            True if the reply ended with a carriage return, False if the timeout was reached
+
+        """
+        CR = b"\r"
+        metrics = self.metrics
+        if metrics is not None: 
+            t0 = time.perf_counter()
+        answer = self.ser.read_until(CR)
+        if self.recorder is not None: 
+            self.recorder.record(REPLY, answer)
+        complete = answer.endswith(CR)
+        if metrics is not None: 
+            metrics.observe('read', time.perf_counter() - t0)
+            metrics.count('bytes_in', len(answer))
+            if len(answer) == 0: 
+                metrics.count('empty_replies')
+            elif not complete: 
+                metrics.count('short_replies')
+        if complete: 
+            answer = answer[0:-1] #last byte is a carriage return (useless)
+        return answer, complete
 
-    def write(self, command):
+    def write(self, command, min_delay=None):
         """
         Serial write.
 
@@ -62,14 +526,33 @@ class programmer(object):
         ----------
         command : string
             command to be passed to the controller
+        min_delay : float, optional
+            min time in seconds since the previous command. The default is the min_delay attribute.
         """
         CR = "\r"
         input_bytes = bytes(command + CR, 'ascii')
+        metrics = self.metrics
+        if metrics is not None: 
+            t0 = time.perf_counter()
+        if min_delay is None: 
+            min_delay = self.min_delay
+        # only wait for what is left of the min delay since the last command
+        wait = self.last_write + min_delay - time.monotonic()
+        if wait > 0: 
+            sleep(wait)
         self.ser.write(input_bytes)
+        self.last_write = time.monotonic()
+        self.sequence += 1
+        if self.recorder is not None: 
+            self.recorder.record(REQUEST, input_bytes, self.last_write)
+        if metrics is not None: 
+            metrics.observe('write', time.perf_counter() - t0)
+            metrics.count('bytes_out', len(input_bytes))
 
     def query(self, command):
         """
         write a command and read the reply.
+        The duration of the round trip is stored in the latency attribute.
         
         Parameters
         ----------
@@ -82,13 +565,214 @@ class programmer(object):
             one or more bytes
 
         """
+        scheduler = self.scheduler
+        if scheduler is not None and not scheduler.bypass(): 
+            return scheduler.query(command)
+        metrics = self.metrics
+        if metrics is not None: 
+            t0 = time.perf_counter()
         with self.lock:
+          if metrics is not None: 
+              metrics.observe('lock_wait', time.perf_counter() - t0)
+              metrics.count('queries')
+          if self.batching is not None: 
+              if command not in DATA_COMMANDS: 
+                  # no data expected: the acknowledgement is read at the end of the batch
+                  # the first one still follows the previous query by min_delay
+                  self.write(command, self.batching.delay if self.batching.commands else None)
+                  self.batching.commands.append(command)
+                  return b''
+              self.drain_batch()
           self.write(command)
-          sleep(0.008) #min delay is 8 ms according to documentation
           answer =  self.read()
+          self.latency = time.monotonic() - self.last_write
+          if metrics is not None: 
+              metrics.observe('round_trip', self.latency)
           return answer 
     
+    def enable_metrics(self): 
+        """
+        start counting the serial I/O of the programmer (see stats)
+
+        Returns
+        -------
+        metrics : Metrics.Metrics
+            counters and histograms, also served by Metrics.MetricsServer
+        """
+        from .Metrics import Metrics
+        if self.metrics is None: 
+            self.metrics = Metrics(self.port)
+        return self.metrics
+    
+    def enable_analytics(self, window=30, alpha=0.1): 
+        """
+        compute the measured rate and the tracking of the commanded ramp with 
+        each snapshot (see Analytics.RampTracker), available in reading.analytics
+
+        Parameters
+        ----------
+        window : int, optional
+            number of samples of the rate regression. The default is 30.
+        alpha : float, optional
+            weight of a new rate in its moving average. The default is 0.1.
+
+        Returns
+        -------
+        tracker : Analytics.RampTracker
+            its summary() gives the statistics of the run so far
+        """
+        from .Analytics import RampTracker
+        self.analytics = RampTracker(window, alpha)
+        return self.analytics
+    
+    def enable_scheduler(self, maxsize=64, timeout=None): 
+        """
+        run the queries of all the threads from a single dispatcher thread, 
+        the commands without data (stop, hold, rate...) before the queued 
+        'T' reads, which are shared when requested at the same time 
+        (see Scheduler.CommandScheduler)
+
+        Parameters
+        ----------
+        maxsize : int, optional
+            max number of queued 'T' reads. The default is 64.
+        timeout : float, optional
+            max time to wait for room in the queue before raising queue.Full. 
+            The default is None.
+
+        Returns
+        -------
+        scheduler : Scheduler.CommandScheduler
+        """
+        from .Scheduler import CommandScheduler
+        if self.scheduler is None: 
+            self.scheduler = CommandScheduler(self, maxsize, timeout)
+        return self.scheduler
+    
+    def disable_scheduler(self): 
+        scheduler, self.scheduler = self.scheduler, None
+        if scheduler is not None: 
+            scheduler.close()
+    
+    def disable_metrics(self): 
+        self.metrics = None
+    
+    def stats(self): 
+        """
+        counters (queries, empty and short replies, stale readings, retries, 
+        bytes in and out) and latency histograms (round trip, write, read, 
+        lock wait) of the serial I/O, empty if the metrics are not enabled, 
+        and the queues of the scheduler if it is enabled
+        """
+        stats = {} if self.metrics is None else self.metrics.stats()
+        if self.scheduler is not None: 
+            stats['scheduler'] = self.scheduler.stats()
+        return stats
+    
+    def transmission_time(self, command): 
+        """
+        time in seconds to send a command and receive its acknowledgement 
+        (10 bits per byte, command + carriage return + acknowledgement), 
+        the lowest useful delay of a batch
+        """
+        return 10*(len(command) + 2)/self.baudrate
+    
+    @contextlib.contextmanager
+    def batch(self, delay=None): 
+        """
+        send the commands that do not return data (set_rate, set_limit, start...) 
+        back to back, and read their acknowledgements at the end of the block. 
+        Other threads wait for the end of the block to use the controller.
+        
+            with TMS94.batch() as b: 
+                TMS94.set_rate(10)
+                TMS94.set_limit(100)
+                TMS94.start()
+            print(b.acks)
+
+        Parameters
+        ----------
+        delay : float, optional
+            min time in seconds between two commands of the batch. The default 
+            is the min_delay attribute, the delay required by the documentation. 
+            Shorter delays, down to transmission_time(command), rely on the 
+            controller buffering the commands: check them on your controller 
+            with batch.acks.
+
+        Yields
+        ------
+        batch : Batch
+            batch.acks is filled at the end of the block
+        """
+        with self.lock: 
+            if self.batching is not None: # nested batch: part of the outer one
+                yield self.batching
+                return
+            self.batching = Batch(self.min_delay if delay is None else delay)
+            try: 
+                yield self.batching
+            finally: 
+                self.drain_batch()
+                self.batching = None
+        
+    def setup(self, rate, limit, start=True): 
+        """
+        set the rate and the limit of a ramp and start it, in a single batch
+
+        Parameters
+        ----------
+        rate : float
+            °C/min, resolution 0.01°C/min
+        limit : float
+            °C, resolution 0.1°C
+        start : bool, optional
+            start the ramp. The default is True.
+
+        Returns
+        -------
+        batch : Batch
+            commands sent and their acknowledgements
+        """
+        with self.batch() as batch: 
+            self.set_rate(rate)
+            self.set_limit(limit)
+            if start: 
+                self.start()
+        return batch
+        
+    def drain_batch(self): 
+        """
+        read the acknowledgements of the commands sent in the current batch
+        """
+        batch = self.batching
+        while len(batch.acks) < len(batch.commands): 
+            answer, complete = self.read_reply()
+            batch.acks.append(complete)
+    
    
+    def capture(self, file):
+        """
+        record every frame written to and read from the controller in a capture file 
+        (see Capture.replay and Capture.ReplayTransport to use it)
+
+        Parameters
+        ----------
+        file : string
+            path of the capture file
+
+        """
+        from .Capture import CaptureWriter
+        self.stop_capture()
+        self.recorder = CaptureWriter(file)
+    
+    def stop_capture(self):
+        """
+        stop recording the frames and close the capture file
+        """
+        if self.recorder is not None: 
+            self.recorder.close()
+            self.recorder = None
+    
     def set_rate(self, rate): 
         """
         set the heating or cooling rate of a ramp
@@ -99,13 +783,10 @@ class programmer(object):
             °C/min, resolution 0.01°C/min
 
         """
-        max_rate = 15 #°C/min
-        if rate < max_rate:
-            command = ('R1%d' % (rate*100))
+        command = rate_command(rate)
+        if command is not None:
             self.query(command)
             self.rate= rate
-        else: 
-            print('max rate is 15 °C/min')
         
     def set_limit(self, limit):
         """
@@ -117,14 +798,10 @@ class programmer(object):
             °C, resolution 0.1°C
 
         """
-        max_limit = 1400
-        if limit < max_limit: 
-        
-            command = 'L1%d' %(limit*10)
+        command = limit_command(limit)
+        if command is not None: 
             self.query(command)
             self.limit = limit
-        else: 
-            print('max. limit is 1400°C')
             
     def start(self):
         """
@@ -150,29 +827,126 @@ class programmer(object):
     def get_T_bytes(self): 
         """
         function that read the bytes return after the 'T' command has been passed
+        
+        Invalid replies (see valid_T_reply) are discarded with whatever is left 
+        in the input buffer, and the query is sent again, up to T_retries times.
+        
+        Returns
+        -------
+        T_bytes : bytearray
+            bytes returned by the controller (empty if no valid reply was read)
         """
-        answer = self.query('T')
-        self.T_bytes = bytearray(answer)
+        return self.read_T()[0]
+    
+    def read_T(self): 
+        """
+        'T' query of get_T_bytes, also giving the number of the 'T' command 
+        answered by the reply
+
+        Returns
+        -------
+        T_bytes : bytearray
+            bytes returned by the controller (empty if no valid reply was read)
+        sequence : int
+            value of the sequence attribute once the 'T' command was written
+        """
+        scheduler = self.scheduler
+        if scheduler is not None and not scheduler.bypass(): 
+            # the threads asking for the T bytes at the same time share a single query
+            from .Scheduler import TELEMETRY
+            return scheduler.submit(self.read_T, (), TELEMETRY, 'read_T')
+        with self.lock: 
+            for attempt in range(self.T_retries + 1): 
+                if attempt > 0: 
+                    if self.metrics is not None: 
+                        self.metrics.count('retries')
+                    # drop the rest of a partial or late frame before querying again
+                    self.ser.reset_input_buffer()
+                answer = self.query('T')
+                if valid_T_reply(answer): 
+                    break
+            else: 
+                answer = b''
+            sequence = self.sequence
+        T_bytes = bytearray(answer)
+        self.T_bytes = T_bytes
         #print(len(self.T_bytes))
-        if len(self.T_bytes)>0: 
-            self.SB1 = self.T_bytes[0]
-            self.EB1 = self.T_bytes[1]
-            self.T_C_bytes = self.T_bytes[6:10]
+        if len(T_bytes)>0: 
+            self.SB1 = T_bytes[0]
+            self.EB1 = T_bytes[1]
+            self.T_C_bytes = T_bytes[6:10]
+        elif self.metrics is not None: 
+            # SB1, EB1 and T_C_bytes still hold the values of the last reply
+            self.metrics.count('stale_readings')
+        return T_bytes, sequence
+    
+    def snapshot(self):
+        """
+        read temperature, status and error with a single 'T' query
         
-    def decode_temperature(self):
+        If the controller gives no valid reply, even after the retries of 
+        get_T_bytes, the values of the last reading are used again and the 
+        reading is marked as stale.
+
+        Returns
+        -------
+        reading : Reading
+            immutable and timestamped reading of the controller, also passed 
+            to the listeners (see add_listener)
+        """
+        T_bytes, sequence = self.read_T()
+        timestamp = time.time()
+        with self.lock: 
+            # snapshot is called from many threads: the readings go through the 
+            # analytics one at a time, each 'T' reply once and in the order of the commands
+            last = self.last_reading
+            reading = decode_reading(T_bytes, timestamp, last, sequence)
+            newer = last is None or last.sequence is None or sequence > last.sequence
+            if self.analytics is not None: 
+                # attached before the listeners get the reading
+                state = self.analytics.update(reading, self.rate, self.limit) if newer else self.analytics.state
+                reading = reading.replace(analytics=state)
+            if newer: 
+                self.T_C = reading.temperature
+                self.last_reading = reading
+        for listener in list(self.listeners): 
+            listener(reading)
+        return reading
+    
+    def add_listener(self, listener): 
+        """
+        call a function with each new reading, whoever asked for it 
+        (datalog, Qt poller, pool...), without extra queries
+
+        Parameters
+        ----------
+        listener : callable
+            function taking a Reading, called from the thread that read it
+
+        """
+        self.listeners.append(listener)
+    
+    def remove_listener(self, listener): 
+        self.listeners.remove(listener)
+        
+    def decode_temperature(self, T_C_bytes=None):
         """
         function to decode the temperature bytes returned by the controller
 
+        Parameters
+        ----------
+        T_C_bytes : bytes, optional
+            temperature bytes to decode. The default is the last bytes read.
+
         Returns
         -------
         T_C : int
             temperature in °C
 
         """
-        hex_temp = ''
-        for b in self.T_C_bytes: 
-            hex_temp+=(chr(b))
-        T_C = int(hex_temp, 16)/10
+        if T_C_bytes is None: 
+            T_C_bytes = self.T_C_bytes
+        T_C = temperature_value(T_C_bytes)
         self.T_C  = T_C
         return T_C
     
@@ -187,36 +961,26 @@ class programmer(object):
              temperature in degree Celsius with 0.1°C precision
 
         """
-        self.get_T_bytes()
-        temperature = self.decode_temperature()
-        return temperature
+        return self.snapshot().temperature
     
-    def decode_status_byte(self):
+    def decode_status_byte(self, SB1=None):
         """
         function that decode the status byt read from the controller
 
+        Parameters
+        ----------
+        SB1 : int, optional
+            status byte to decode. The default is the last status byte read.
+
         Returns
         -------
         status : string
             status of the controller according to the documentation 
 
         """
-        SB1 = self.SB1
-        if SB1 == int(str('01'),16): 
-            status = 'stopped'
-        elif SB1 == int(str('10'),16): 
-            status = 'heating'
-        elif SB1 == int(str('20'),16): 
-            status = 'cooling'
-        elif SB1 == int(str('30'),16): 
-            status = 'holding at the limit or limit reached end of a ramp'
-        elif SB1 == int(str('40'),16): 
-            status = 'holding the limit time'
-        elif SB1 == int(str('50'),16): 
-            status = 'holding the current temperature'
-        else: 
-            status = 'problem reading SB1'
-        return status
+        if SB1 is None: 
+            SB1 = self.SB1
+        return status_message(SB1)
     
     @property
     def status(self): 
@@ -229,39 +993,26 @@ class programmer(object):
             status message describing the current status of the machine
 
         """
-        self.get_T_bytes()
-        status = self.decode_status_byte()
-        return status 
+        return self.snapshot().status
     
-    def decode_error_byte(self):
+    def decode_error_byte(self, EB1=None):
         """
         function that decode the error byte read from the controller
 
+        Parameters
+        ----------
+        EB1 : int, optional
+            error byte to decode. The default is the last error byte read.
+
         Returns
         -------
         error_message : string
             error messages according to the documentation 
 
         """
-        EB1 =  format(self.EB1, 'b')
-        error_message = ''
-        
-        if EB1[-1] == 1: 
-            error_message += 'Cooling rate cannot be maintained \n'
-        if EB1[-2] == 1: 
-            error_message += 'Stage not connected or sensor is open circuit \n'
-        if EB1[-3] == 1: 
-            error_message += 'Current protection has been set due to an overload \n'
-        if EB1[-4] == 1: 
-            error_message += 'TS1500 stage tried to exit profile at a temperature > 300°C (not allowed)\n'
-        if EB1[-5] == 1: 
-            error_message += 'TMS92 has a TS1500 and THM stage connected (not allowed)\n'
-        if EB1[-6] == 1: 
-            error_message += 'Problems with the RS232 data transmission\n'
-        
-        if error_message == '':
-            error_message += 'no error'
-        return error_message
+        if EB1 is None: 
+            EB1 = self.EB1
+        return error_message(EB1)
     
     @property
     def error(self): 
@@ -274,13 +1025,18 @@ class programmer(object):
             error string 
 
         """
-        self.get_T_bytes()
-        error = self.decode_error_byte()
-        return error
+        return self.snapshot().error
     
     def datalog(self,interval=1, file = 'datalog.csv' ):
         """
         start a data logging thread in the background
+        
+        Samples are taken on a fixed time grid (see Timing.SampleClock), 
+        buffered in memory and written to file in batches (see Datalogger). 
+        Files with a .csv extension are written as text, files with a .pylk 
+        extension are compressed archives holding the rate and limit too 
+        (see Datalogger.ArchiveReader), any other extension gives a compact 
+        binary file that can be read with Datalogger.read_log.
 
         Parameters
         ----------
@@ -294,8 +1050,17 @@ class programmer(object):
         None.
 
         """
+        from .Datalogger import ArchiveLogger, BinaryLogger, CSVLogger
+        from .Timing import SampleClock
         self.interval = interval
+        self.clock = SampleClock(interval)
         self.file = file
+        if file.endswith('.csv'): 
+            self.logger = CSVLogger(file)
+        elif file.endswith('.pylk'): 
+            self.logger = ArchiveLogger(file, controller=self)
+        else: 
+            self.logger = BinaryLogger(file)
         
         thread = threading.Thread(target=self.log, args=())
         thread.daemon = True                            # Daemonize thread
@@ -310,24 +1075,18 @@ class programmer(object):
         None.
 
         """
-        i = 0
-        while self.ser.is_open:
-            if i ==0: 
-                t0 = time.time()
-            delta_t = time.time() - t0
-            
-            # get the T byte once per time step
-            self.get_T_bytes()
-            # decode T byte
-            T_C = self.decode_temperature()
-            status = self.decode_status_byte()
-            error = self.decode_error_byte()
-            #save to file
-            csv_file = open(self.file, "a")
-            csv_file.write(f"{delta_t}, {T_C}, {status}, {error}\n")
-            csv_file.close()
-            sleep(self.interval)
-            i+=1
+        try: 
+            while self.ser.is_open:
+                # wait for the next deadline, whatever the time spent on the previous sample
+                jitter = self.clock.wait()
+                # get the T byte once per time step
+                reading = self.snapshot()
+                self.logger.append(reading, jitter)
+        finally: 
+            # write the buffered samples when the serial connection is closed
+            self.logger.close()
+            if self.analytics is not None: 
+                self.run_summary = self.analytics.summary()
             
     def __del__(self):
         self.ser.close()
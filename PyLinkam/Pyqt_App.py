@@ -3,9 +3,9 @@ from PyQt5 import QtCore#, QtGui
 import sys
 
 from .PyLinkam import programmer
-from .Pyqt_Widget import ControllerThread, ControllerSimple
+from .Pyqt_Widget import ControllerPoller, ControllerSimple
 
-def ControllerDisplay(port, prog_name, verbose = True):
+def ControllerDisplay(port, prog_name, verbose = True, interval = 1):
     """
     basic display of the temperature returned by the pyrometer in its current opertion mode
 
@@ -13,6 +13,8 @@ def ControllerDisplay(port, prog_name, verbose = True):
     ----------
     port : string
         port used to establish the serial communication with the pyrometer
+    interval : float, optional
+        time in seconds between two readings of the controller. The default is 1.
     """
 
     app = QtCore.QCoreApplication.instance()
@@ -23,7 +25,7 @@ def ControllerDisplay(port, prog_name, verbose = True):
     TMS94 = programmer(port)
     if verbose: 
         print('create programmer thread')
-    prog_thread = ControllerThread(TMS94, verbose = verbose)
+    prog_thread = ControllerPoller(TMS94, interval = interval, verbose = verbose)
     if verbose: 
         print('create app')
     a = ControllerSimple(prog_thread, ControllerName = prog_name, verbose = verbose)
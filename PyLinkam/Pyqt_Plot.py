@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Live temperature plot, whose redraw cost depends on its width and not on the run length.
+"""
+from PyQt5.QtWidgets import QWidget
+from PyQt5.QtGui import QPainter, QPen, QColor
+from PyQt5.QtCore import pyqtSlot, Qt, QLineF, QPointF
+import numpy as np
+
+
+class DecimatingBuffer(object):
+    """
+    fixed size min/max summary of a whole run
+
+    Samples are grouped in buckets keeping the time of their first sample and
+    the min and max temperatures. When all the buckets are used, consecutive
+    buckets are merged two by two and each bucket covers twice as many samples,
+    so the memory is bounded whatever the length of the run.
+    """
+    def __init__(self, capacity=4096):
+        """
+        Parameters
+        ----------
+        capacity : int, optional
+            number of buckets, a few times the width of the plot. The default is 4096.
+        """
+        self.capacity = capacity - capacity % 2
+        self.t = np.zeros(self.capacity, dtype=np.float64)
+        self.low = np.zeros(self.capacity, dtype=np.float32)
+        self.high = np.zeros(self.capacity, dtype=np.float32)
+        self.n = 0 # number of full buckets
+        self.count = 0 # number of samples in the current bucket
+        self.span = 1 # number of samples per bucket
+        self.samples = 0
+
+    def __len__(self):
+        return self.n + (self.count > 0)
+
+    def append(self, t, T):
+        """
+        add a sample
+
+        Parameters
+        ----------
+        t : float
+            time of the sample (s)
+        T : float
+            temperature (°C), ignored if None or nan
+        """
+        if T is None or T != T:
+            return
+        i = self.n
+        if self.count == 0:
+            self.t[i] = t
+            self.low[i] = T
+            self.high[i] = T
+        else:
+            if T < self.low[i]:
+                self.low[i] = T
+            if T > self.high[i]:
+                self.high[i] = T
+        self.count += 1
+        self.samples += 1
+        if self.count == self.span:
+            self.n += 1
+            self.count = 0
+            if self.n == self.capacity:
+                self.compact()
+
+    def compact(self):
+        """
+        merge the buckets two by two
+        """
+        half = self.n//2
+        self.t[:half] = self.t[0:2*half:2]
+        self.low[:half] = np.minimum(self.low[0:2*half:2], self.low[1:2*half:2])
+        self.high[:half] = np.maximum(self.high[0:2*half:2], self.high[1:2*half:2])
+        self.n = half
+        self.span *= 2
+
+    def data(self):
+        """
+        time, min and max temperature of the buckets, including the current one
+        """
+        n = len(self)
+        return self.t[:n], self.low[:n], self.high[:n]
+
+    def columns(self, width):
+        """
+        min and max temperature per pixel column
+
+        Parameters
+        ----------
+        width : int
+            number of pixel columns
+
+        Returns
+        -------
+        x : numpy.ndarray
+            index of the non empty columns
+        low, high : numpy.ndarray
+            min and max temperature in each of these columns
+        """
+        t, low, high = self.data()
+        if len(t) == 0 or width < 1:
+            return np.zeros(0, dtype=int), low, high
+        duration = max(t[-1] - t[0], 1e-9)
+        x = ((t - t[0])/duration*(width - 1)).astype(int)
+        starts = np.flatnonzero(np.r_[True, x[1:] != x[:-1]])
+        return x[starts], np.minimum.reduceat(low, starts), np.maximum.reduceat(high, starts)
+
+
+class TemperaturePlot(QWidget):
+    """
+    live plot of the temperature against time with the setpoint (limit) and the rate
+    """
+    margin = 30 # pixels around the plot area
+    def __init__(self, capacity = 4096, parent = None):
+        super().__init__(parent)
+        self.buffer = DecimatingBuffer(capacity)
+        self.limit = None
+        self.rate = None
+        self.setMinimumSize(300, 200)
+
+    @pyqtSlot(object)
+    def add_reading(self, reading):
+        """
+        Adds a reading to the plot
+        """
+        self.buffer.append(reading.timestamp, reading.temperature)
+        self.update()
+
+    def set_setpoint(self, limit = None, rate = None):
+        """
+        Updates the limit and rate displayed with the temperature
+        """
+        self.limit = limit
+        self.rate = rate
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.white)
+        m = self.margin
+        w = self.width() - 2*m
+        h = self.height() - 2*m
+        painter.setPen(QPen(Qt.black))
+        painter.drawRect(m, m, w, h)
+        if self.rate is not None:
+            painter.drawText(m, m - 8, f'rate: {self.rate} °C/min')
+        x, low, high = self.buffer.columns(w)
+        if len(x) == 0:
+            painter.end()
+            return
+        T_min, T_max = float(low.min()), float(high.max())
+        if self.limit is not None:
+            T_min, T_max = min(T_min, self.limit), max(T_max, self.limit)
+        if T_max - T_min < 1:
+            T_min, T_max = T_min - 0.5, T_max + 0.5
+        scale = h/(T_max - T_min)
+        y_low = m + h - (low - T_min)*scale
+        y_high = m + h - (high - T_min)*scale
+        x = x + m
+        # setpoint
+        if self.limit is not None:
+            y = m + h - (self.limit - T_min)*scale
+            painter.setPen(QPen(QColor('red'), 1, Qt.DashLine))
+            painter.drawLine(QLineF(m, y, m + w, y))
+            painter.drawText(m + w - 80, int(y) + 14 if y < m + 20 else int(y) - 4, f'limit: {self.limit} °C')
+        # temperature: min/max bar per column and a line between the columns
+        painter.setPen(QPen(QColor('blue'), 1))
+        painter.drawLines([QLineF(xi, yl, xi, yh) for xi, yl, yh
+                           in zip(x.tolist(), y_low.tolist(), y_high.tolist())])
+        y_mid = ((y_low + y_high)/2).tolist()
+        painter.drawPolyline(*[QPointF(xi, yi) for xi, yi in zip(x.tolist(), y_mid)])
+        # axis labels
+        painter.setPen(QPen(Qt.black))
+        painter.drawText(2, m + 10, f'{T_max:.1f}')
+        painter.drawText(2, m + h, f'{T_min:.1f}')
+        t, _, _ = self.buffer.data()
+        painter.drawText(m + w - 60, m + h + 20, f'{t[-1] - t[0]:.0f} s')
+        painter.end()
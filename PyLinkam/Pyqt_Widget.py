@@ -3,14 +3,18 @@
 #from PyQt5 import QtGui
 from PyQt5.QtWidgets import  QWidget,QLineEdit, QLabel,QVBoxLayout, QHBoxLayout, QPushButton#,QTabWidget
 from PyQt5.QtGui import QIntValidator # QDoubleValidator,
-from PyQt5.QtCore import pyqtSlot, Qt, pyqtSignal, QThread
-import numpy as np
+from PyQt5.QtCore import pyqtSlot, Qt, pyqtSignal, QThread, QTimer
 
+import threading
+import time
 from time import sleep
 
+from .Timing import SampleClock
+from .Pyqt_Plot import TemperaturePlot
+
 
 class ControllerThread(QThread):
-    temperature = pyqtSignal(np.float)
+    temperature = pyqtSignal(object) # float, None if the controller never answered
     status = pyqtSignal(str)
     error = pyqtSignal(str)
     on = False
@@ -26,12 +30,11 @@ class ControllerThread(QThread):
         self.on = True
         # read the temperature, status and error from the controller
         while self.on:
-            #self.controller.get_T_bytes()
-            self.temperature.emit(self.controller.temperature)
-            sleep(self.sleep_time)
-            self.status.emit(self.controller.status)
-            sleep(self.sleep_time)
-            self.error.emit(self.controller.error)
+            # a single 'T' query per cycle
+            reading = self.controller.snapshot()
+            self.temperature.emit(reading.temperature)
+            self.status.emit(reading.status)
+            self.error.emit(reading.error)
             sleep(self.sleep_time)
         self.status.emit('Furnace off')
     def stop(self):
@@ -39,7 +42,64 @@ class ControllerThread(QThread):
         self.on = False
         self.wait()
         
+class ControllerPoller(QThread):
+    """
+    Polls the controller with a single snapshot per tick and emits the reading
+    only when it changed, or when no reading was emitted for heartbeat seconds
+    """
+    reading = pyqtSignal(object)
+    on = False
+    def __init__(self, controller, interval = 1, heartbeat = 10, verbose = True):
+        """
+        Parameters
+        ----------
+        controller : programmer
+            controller to poll
+        interval : float, optional
+            time in seconds between two readings. The default is 1.
+        heartbeat : float, optional
+            max time in seconds between two emitted readings. The default is 10.
+        """
+        super().__init__()
+        self.controller = controller
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self.verbose = verbose
+        self.stop_event = threading.Event()
+        self.emitted = 0 # number of readings emitted
+        self.polled = 0 # number of readings polled
+        
+    def run(self):
+        if self.verbose: 
+            print('running')
+        self.on = True
+        self.stop_event.clear()
+        clock = SampleClock(self.interval)
+        last = None
+        last_emit = 0
+        while self.on:
+            # wait for the next tick, or for stop()
+            if self.stop_event.wait(clock.time_left()): 
+                break
+            clock.wait()
+            reading = self.controller.snapshot()
+            self.polled += 1
+            values = (reading.temperature, reading.SB1, reading.EB1)
+            now = time.monotonic()
+            if values != last or now - last_emit >= self.heartbeat: 
+                self.reading.emit(reading)
+                self.emitted += 1
+                last = values
+                last_emit = now
+        
+    def stop(self):
+        """Sets on flag to False and waits for thread to finish"""
+        self.on = False
+        self.stop_event.set()
+        self.wait()
+        
 class ControllerSimple(QWidget):
+    repaint_interval = 100 # min time in ms between two repaints of the readings
     def __init__(self, ControllerThread, ControllerName= 'TMS94', verbose = True):
         super().__init__()
         self.verbose = verbose
@@ -49,9 +109,19 @@ class ControllerSimple(QWidget):
         # start the thread
         self.controller_thread.start()
         self.controller_thread.on = True
-        self.controller_thread.temperature.connect(self.update_temp)
-        self.controller_thread.status.connect(self.update_status)
-        self.controller_thread.error.connect(self.update_error)
+        self.pending_reading = None
+        if isinstance(self.controller_thread, ControllerPoller): 
+            self.controller_thread.reading.connect(self.update_reading)
+            self.controller_thread.finished.connect(self.furnace_off)
+        else: 
+            self.controller_thread.temperature.connect(self.update_temp)
+            self.controller_thread.status.connect(self.update_status)
+            self.controller_thread.error.connect(self.update_error)
+        # readings received from the poller are repainted together by a timer
+        self.repaint_timer = QTimer(self)
+        self.repaint_timer.setInterval(self.repaint_interval)
+        self.repaint_timer.timeout.connect(self.repaint_reading)
+        self.repaint_timer.start()
         
         # main vertical layout
         self.vbox = QVBoxLayout()
@@ -109,9 +179,46 @@ class ControllerSimple(QWidget):
         rl_layout.addLayout(rl_buttons)
         self.vbox.addLayout(rl_layout)
         
+        #4th row: live plot of the temperature (readings of a ControllerPoller)
+        self.plot = None
+        if isinstance(self.controller_thread, ControllerPoller): 
+            self.plot = TemperaturePlot()
+            self.controller_thread.reading.connect(self.plot.add_reading)
+            self.vbox.addWidget(self.plot)
+        
         self.setLayout(self.vbox)
     
-    @pyqtSlot(np.float)
+    @pyqtSlot(object)
+    def update_reading(self, reading):
+        """
+        Keeps the last reading, displayed at the next repaint
+        """
+        self.pending_reading = reading
+    
+    def repaint_reading(self):
+        """
+        Updates the temperature, status and error displayed in the app in a single repaint
+        """
+        reading = self.pending_reading
+        if reading is None: 
+            return
+        self.pending_reading = None
+        texts = ((self.temperature_display, f'{reading.temperature}'), 
+                 (self.status_display, reading.status), 
+                 (self.error_display, reading.error))
+        changed = [(label, text) for label, text in texts if label.text() != text]
+        if changed: 
+            self.setUpdatesEnabled(False)
+            for label, text in changed: 
+                label.setText(text)
+            self.setUpdatesEnabled(True)
+    
+    @pyqtSlot()
+    def furnace_off(self):
+        self.repaint_reading()
+        self.status_display.setText('Furnace off')
+    
+    @pyqtSlot(object)
     def update_temp(self, T_C):
         """
         Updates the temperature displayed in the app
@@ -176,6 +283,7 @@ class ControllerSimple(QWidget):
             e = float(r.replace(',', '.'))
             self.controller_thread.controller.set_rate(e)
             self.rate_input.setText(str(self.controller_thread.controller.rate))
+            self.update_setpoint()
         if self.verbose: 
             print('input', e)
             print('rate', self.controller_thread.controller.rate)
@@ -186,16 +294,28 @@ class ControllerSimple(QWidget):
             e = float(r.replace(',', '.'))
             self.controller_thread.controller.set_limit(e)
             self.limit_input.setText(str(self.controller_thread.controller.limit))
+            self.update_setpoint()
             print('input', e)
         if self.verbose: 
             print('input', e)
             print('limit',self.controller_thread.controller.limit)
         
+    def update_setpoint(self): 
+        if self.plot is not None: 
+            controller = self.controller_thread.controller
+            self.plot.set_setpoint(controller.limit, controller.rate)
+        
     def closeEvent(self, event):
+        self.repaint_timer.stop()
         if self.controller_thread.on: 
-            self.controller_thread.temperature.disconnect(self.update_temp)
-            self.controller_thread.status.disconnect(self.update_status)
-            self.controller_thread.error.disconnect(self.update_error)
+            if isinstance(self.controller_thread, ControllerPoller): 
+                self.controller_thread.reading.disconnect(self.update_reading)
+                self.controller_thread.reading.disconnect(self.plot.add_reading)
+                self.controller_thread.finished.disconnect(self.furnace_off)
+            else: 
+                self.controller_thread.temperature.disconnect(self.update_temp)
+                self.controller_thread.status.disconnect(self.update_status)
+                self.controller_thread.error.disconnect(self.update_error)
             self.controller_thread.stop()
             self.controller_thread.controller.ser.close()
         event.accept()
\ No newline at end of file
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Command scheduler with priority lanes in front of programmer.query.
+
+Once programmer.enable_scheduler() is called, the queries of all the threads
+are run by a single dispatcher thread. Control commands (every command that
+only gets an acknowledgement: rate, limit, start, stop, hold...) go in the
+control lane and are always sent before the queued telemetry ('T' and the
+other data commands). A 'T' read requested while another one is still
+waiting in the queue shares its reply. The telemetry lane is bounded: when
+it is full, callers wait for room and eventually get queue.Full.
+"""
+import collections
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from .PyLinkam import DATA_COMMANDS
+
+CONTROL = 0
+TELEMETRY = 1
+LANES = ('control', 'telemetry')
+
+
+def priority(command):
+    """
+    lane of a command: CONTROL for the commands without data, TELEMETRY otherwise
+    """
+    return TELEMETRY if command in DATA_COMMANDS else CONTROL
+
+
+class CommandScheduler(object):
+    """
+    run the queries of a programmer from a single thread, control commands first
+    """
+    def __init__(self, controller, maxsize=64, timeout=None):
+        """
+        Parameters
+        ----------
+        controller : programmer
+            controller whose queries are scheduled
+        maxsize : int, optional
+            max number of queued telemetry requests. The default is 64.
+        timeout : float, optional
+            max time in seconds to wait for room in the telemetry lane before
+            raising queue.Full. The default is None (wait as long as needed).
+        """
+        self.controller = controller
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.lanes = (collections.deque(), collections.deque())
+        self.pending = {} # key: future of the queued requests that can be shared
+        self.condition = threading.Condition()
+        self.on = True
+        # backpressure metrics
+        self.submitted = [0, 0]
+        self.executed = [0, 0]
+        self.deduplicated = 0
+        self.blocked = 0 # telemetry requests that had to wait for room in the queue
+        self.rejected = 0 # telemetry requests that gave up waiting (queue.Full)
+        self.max_depth = [0, 0]
+        self.max_wait = [0.0, 0.0] # max time spent queued (s)
+        self.total_wait = [0.0, 0.0]
+        self.thread = threading.Thread(target=self.run, args=(), name=f'PyLinkam-scheduler-{controller.port}')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def bypass(self):
+        """
+        True if the calling thread has to run its queries itself: the dispatcher
+        thread, a thread sending a batch, or any thread once the scheduler is closed
+        """
+        thread = threading.current_thread()
+        batching = self.controller.batching
+        return (thread is self.thread
+                or (batching is not None and batching.thread is thread)
+                or not self.on)
+
+    def submit(self, function, args=(), lane=TELEMETRY, key=None):
+        """
+        queue a call and wait for its result
+
+        Parameters
+        ----------
+        function : callable
+            function run by the dispatcher thread
+        args : tuple, optional
+            arguments of the function
+        lane : int, optional
+            CONTROL or TELEMETRY. The default is TELEMETRY.
+        key : hashable, optional
+            calls with the same key share the result of the one already queued
+
+        Returns
+        -------
+        result :
+            return value of the function
+        """
+        with self.condition:
+            if not self.on: # closed: run from the calling thread
+                future = None
+            elif key is not None and key in self.pending:
+                self.deduplicated += 1
+                future = self.pending[key]
+            else:
+                requests = self.lanes[lane]
+                if lane == TELEMETRY and len(requests) >= self.maxsize:
+                    self.blocked += 1
+                    if not self.condition.wait_for(lambda: len(requests) < self.maxsize or not self.on,
+                                                   self.timeout):
+                        self.rejected += 1
+                        raise queue.Full('telemetry queue of the scheduler is full')
+                future = None
+                if self.on:
+                    future = Future()
+                    requests.append((future, function, args, key, time.monotonic()))
+                    if key is not None:
+                        self.pending[key] = future
+                    self.submitted[lane] += 1
+                    self.max_depth[lane] = max(self.max_depth[lane], len(requests))
+                    self.condition.notify_all()
+        if future is None:
+            return function(*args)
+        return future.result()
+
+    def query(self, command):
+        """
+        scheduled programmer.query
+        """
+        return self.submit(self.controller.query, (command,), priority(command),
+                           'T' if command == 'T' else None)
+
+    def run(self):
+        """
+        method run in the dispatcher thread
+        """
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.lanes[CONTROL] or self.lanes[TELEMETRY] or not self.on)
+                if not self.lanes[CONTROL] and not self.lanes[TELEMETRY]:
+                    break # closed
+                lane = CONTROL if self.lanes[CONTROL] else TELEMETRY
+                future, function, args, key, t_queued = self.lanes[lane].popleft()
+                if key is not None and self.pending.get(key) is future:
+                    del self.pending[key]
+                wait = time.monotonic() - t_queued
+                self.total_wait[lane] += wait
+                self.max_wait[lane] = max(self.max_wait[lane], wait)
+                self.executed[lane] += 1
+                self.condition.notify_all() # room in the queue
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(function(*args))
+                except Exception as e:
+                    future.set_exception(e)
+
+    def stats(self):
+        """
+        per lane: requests submitted, executed and queued, max queue depth,
+        mean and max time spent queued (s); and the deduplicated, blocked
+        and rejected requests
+        """
+        with self.condition:
+            stats = {}
+            for lane, name in enumerate(LANES):
+                stats[name] = {'submitted': self.submitted[lane],
+                               'executed': self.executed[lane],
+                               'queued': len(self.lanes[lane]),
+                               'max_depth': self.max_depth[lane],
+                               'mean_wait': self.total_wait[lane]/self.executed[lane] if self.executed[lane] else None,
+                               'max_wait': self.max_wait[lane]}
+            stats['deduplicated'] = self.deduplicated
+            stats['blocked'] = self.blocked
+            stats['rejected'] = self.rejected
+        return stats
+
+    def close(self):
+        """
+        run the queued requests and stop the dispatcher thread
+        """
+        with self.condition:
+            self.on = False
+            self.condition.notify_all()
+        if threading.current_thread() is not self.thread:
+            self.thread.join()
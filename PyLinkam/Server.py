@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""
+Server owning the serial port of a controller, shared by many local clients.
+
+Clients speak the protocol of the controller over a Unix domain socket or a
+localhost TCP connection: commands end with a carriage return and so do the
+replies, so connect() simply returns a programmer using the socket instead of
+a serial port.
+
+All the serial traffic goes through a single worker thread, in the order the
+commands arrived, so that no client can starve the others. The 'T' queries
+received within one sampling window (or while a 'T' query is in progress)
+get the same reply and cost a single query to the controller.
+
+Run from the command line:
+
+    python -m PyLinkam.Server COM5 --address /tmp/furnace.sock
+"""
+import argparse
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .PyLinkam import programmer
+
+DEFAULT_ADDRESS = ('127.0.0.1', 5094)
+
+
+class ClientHandler(socketserver.BaseRequestHandler):
+    """
+    serve the commands of one client
+    """
+    def handle(self):
+        server = self.server.controller_server
+        server.connected(1)
+        if self.request.family != getattr(socket, 'AF_UNIX', None):
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        buffer = b''
+        try:
+            while True:
+                data = self.request.recv(4096)
+                if not data:
+                    break
+                buffer += data
+                while b'\r' in buffer:
+                    frame, buffer = buffer.split(b'\r', 1)
+                    self.request.sendall(server.handle(frame.decode('ascii', 'replace')) + b'\r')
+        except OSError:
+            pass
+        finally:
+            server.connected(-1)
+
+
+class TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 64
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+        request_queue_size = 64
+
+
+class ControllerServer(object):
+    """
+    expose a programmer to many clients
+    """
+    def __init__(self, controller, address=DEFAULT_ADDRESS, window=0.1):
+        """
+        Parameters
+        ----------
+        controller : programmer
+            controller served, its port is only used by the server
+        address : string or tuple, optional
+            path of a Unix domain socket, or (host, port) of a TCP socket.
+            The default is ('127.0.0.1', 5094).
+        window : float, optional
+            time in seconds during which a 'T' reply is given again to the
+            clients instead of querying the controller. The default is 0.1.
+        """
+        self.controller = controller
+        self.address = address
+        self.window = window
+        self.worker = ThreadPoolExecutor(max_workers=1) # serial traffic, in arrival order
+        self.condition = threading.Condition()
+        self.reading = None # last 'T' reading
+        self.t_reading = 0 # monotonic time of the last 'T' reading
+        self.reading_pending = False
+        self.writes = 0 # control commands forwarded to the controller
+        self.clients = 0
+        self.requests = 0 # commands received from the clients
+        self.T_requests = 0 # 'T' commands received from the clients
+        self.T_queries = 0 # 'T' queries sent to the controller
+        if isinstance(address, str):
+            if os.path.exists(address):
+                os.remove(address)
+            self.server = UnixServer(address, ClientHandler)
+        else:
+            self.server = TCPServer(address, ClientHandler)
+            self.address = self.server.server_address
+        self.server.controller_server = self
+        self.thread = None
+
+    def connected(self, n):
+        with self.condition:
+            self.clients += n
+
+    def handle(self, command):
+        """
+        reply to a command of a client
+
+        Parameters
+        ----------
+        command : string
+            command without the carriage return
+
+        Returns
+        -------
+        reply : bytes
+            reply of the controller without the carriage return
+        """
+        with self.condition:
+            self.requests += 1
+        if command == 'T':
+            return self.read_T()
+        try:
+            return self.worker.submit(self.controller.query, command).result()
+        finally:
+            with self.condition:
+                # the last 'T' reply predates the command
+                self.writes += 1
+                self.reading = None
+
+    def read_T(self):
+        # reply to a 'T' command, sharing the queries with the other clients
+        with self.condition:
+            self.T_requests += 1
+            while True:
+                if self.reading is not None and time.monotonic() - self.t_reading < self.window:
+                    return self.reading.raw
+                if not self.reading_pending:
+                    break
+                self.condition.wait()
+            self.reading_pending = True
+            writes = self.writes
+        reading = None
+        try:
+            reading = self.worker.submit(self.controller.snapshot).result()
+        finally:
+            with self.condition:
+                self.reading_pending = False
+                if reading is not None:
+                    self.T_queries += 1
+                    # not shared if a control command ended while the query was queued
+                    if self.writes == writes:
+                        self.reading = reading
+                        self.t_reading = time.monotonic()
+                self.condition.notify_all()
+        return reading.raw
+
+    @property
+    def stats(self):
+        """
+        number of clients, of commands received and of 'T' queries sent to the controller
+        """
+        with self.condition:
+            return {'clients': self.clients,
+                    'requests': self.requests,
+                    'T_requests': self.T_requests,
+                    'T_queries': self.T_queries,
+                    'T_coalesced': self.T_requests - self.T_queries}
+
+    def start(self):
+        """
+        serve the clients from a background thread
+        """
+        self.thread = threading.Thread(target=self.server.serve_forever, args=())
+        self.thread.daemon = True
+        self.thread.start()
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def close(self):
+        """
+        stop the server, the controller is left open
+        """
+        self.server.shutdown()
+        self.server.server_close()
+        self.worker.shutdown()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class SocketTransport(object):
+    """
+    serial-like transport connected to a ControllerServer
+    """
+    def __init__(self, address=DEFAULT_ADDRESS, timeout=1):
+        """
+        Parameters
+        ----------
+        address : string or tuple, optional
+            address of the server. The default is ('127.0.0.1', 5094).
+        timeout : float, optional
+            max time to wait for a reply (s). The default is 1.
+        """
+        if isinstance(address, str):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.settimeout(timeout)
+        self.sock.connect(address)
+        self.timeout = timeout
+        self.buffer = b''
+        self.is_open = True
+
+    def write(self, data):
+        self.sock.sendall(data)
+        return len(data)
+
+    def read_until(self, expected=b'\r', size=None):
+        while expected not in self.buffer:
+            try:
+                data = self.sock.recv(4096)
+            except socket.timeout:
+                break
+            if not data:
+                self.is_open = False
+                break
+            self.buffer += data
+        i = self.buffer.find(expected)
+        end = len(self.buffer) if i < 0 else i + len(expected)
+        answer, self.buffer = self.buffer[:end], self.buffer[end:]
+        return answer
+
+    @property
+    def in_waiting(self):
+        return len(self.buffer)
+
+    def reset_input_buffer(self):
+        self.buffer = b''
+
+    def close(self):
+        self.is_open = False
+        self.sock.close()
+
+
+def connect(address=DEFAULT_ADDRESS, timeout=1):
+    """
+    programmer talking to a ControllerServer instead of a serial port
+
+    Parameters
+    ----------
+    address : string or tuple, optional
+        address of the server. The default is ('127.0.0.1', 5094).
+    timeout : float, optional
+        max time to wait for a reply (s). The default is 1.
+
+    Returns
+    -------
+    prog : programmer
+    """
+    prog = programmer(port=address, transport=SocketTransport(address, timeout))
+    prog.min_delay = 0 # the server spaces the commands sent to the controller
+    return prog
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='serve a Linkam controller to local clients')
+    parser.add_argument('port', help='serial port of the controller')
+    parser.add_argument('--address', default=None,
+                        help='path of a Unix domain socket, or host:port (default 127.0.0.1:5094)')
+    parser.add_argument('--window', type=float, default=0.1,
+                        help="time during which a 'T' reply is shared between clients (s)")
+    args = parser.parse_args(argv)
+    address = DEFAULT_ADDRESS
+    if args.address is not None:
+        host, _, port = args.address.rpartition(':')
+        address = (host, int(port)) if port.isdigit() and host else args.address
+    server = ControllerServer(programmer(args.port), address, args.window)
+    print(f'serving {args.port} on {server.address}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+Readings of one controller shared with other processes through shared memory
+(Python >= 3.8).
+
+The process owning the serial port publishes the last reading and a history
+ring in a multiprocessing.shared_memory block. Readers in other processes
+attach to the block by its name and read it without any serial I/O. The block
+is guarded by a seqlock: the writer makes the sequence number odd while it
+writes, readers retry when the number was odd or changed during their copy.
+"""
+import re
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .PyLinkam import Reading, status_message, error_message, valid_T_reply
+from .Timing import SampleClock
+
+HEADER = np.dtype([('seq', '<u8'), ('count', '<u8'), ('capacity', '<u8'), ('pad', '<u8')])
+SAMPLE = np.dtype([('time', '<f8'),
+                   ('temperature', '<f4'),
+                   ('status', 'u1'),
+                   ('error', 'u1'),
+                   ('raw', 'S10')])
+
+published = set() # names of the blocks created by this process
+
+
+def layout(buf, capacity):
+    # numpy views on the header, the last reading and the history of a block
+    header = np.ndarray(1, dtype=HEADER, buffer=buf)
+    latest = np.ndarray(1, dtype=SAMPLE, buffer=buf, offset=HEADER.itemsize)
+    history = np.ndarray(capacity, dtype=SAMPLE, buffer=buf,
+                         offset=HEADER.itemsize + SAMPLE.itemsize)
+    return header, latest, history
+
+
+def block_size(capacity):
+    return HEADER.itemsize + SAMPLE.itemsize*(capacity + 1)
+
+
+class SnapshotPublisher(object):
+    """
+    publish the readings of a controller in a shared memory block
+
+    Every reading returned by controller.snapshot() is published, whoever
+    asked for it (see programmer.add_listener). start() polls the controller
+    from a background thread if nothing else does.
+    """
+    def __init__(self, controller, name=None, capacity=3600):
+        """
+        Parameters
+        ----------
+        controller : programmer
+            controller whose readings are published
+        name : string, optional
+            name of the shared memory block. The default is derived from the port.
+        capacity : int, optional
+            number of readings kept in the history. The default is 3600.
+        """
+        if name is None:
+            name = 'pylinkam_' + re.sub(r'\W', '_', str(controller.port))
+        self.controller = controller
+        self.capacity = capacity
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=block_size(capacity))
+        self.name = self.shm.name
+        published.add(self.name)
+        self.header, self.latest, self.history = layout(self.shm.buf, capacity)
+        self.header[0] = (0, 0, capacity, 0)
+        self.lock = threading.Lock() # one writer at a time, listeners run in any thread
+        self.on = False
+        self.thread = None
+        controller.add_listener(self.publish)
+
+    def publish(self, reading):
+        """
+        write a reading in the shared memory block
+        """
+        T = np.nan if reading.temperature is None else reading.temperature
+        sample = (reading.timestamp, T,
+                  0 if reading.SB1 is None else reading.SB1,
+                  0x80 if reading.EB1 is None else reading.EB1,
+                  reading.raw[:10])
+        header = self.header
+        with self.lock:
+            seq = int(header['seq'][0])
+            count = int(header['count'][0])
+            header['seq'] = seq + 1 # odd: write in progress
+            self.latest[0] = sample
+            self.history[count % self.capacity] = sample
+            header['count'] = count + 1
+            header['seq'] = seq + 2
+
+    def start(self, interval=1):
+        """
+        poll the controller from a background thread
+
+        Parameters
+        ----------
+        interval : float, optional
+            time in seconds between two readings. The default is 1.
+        """
+        self.on = True
+        self.thread = threading.Thread(target=self.run, args=(interval,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self, interval):
+        clock = SampleClock(interval)
+        while self.on and self.controller.ser.is_open:
+            clock.wait()
+            self.controller.snapshot()
+
+    def stop(self):
+        self.on = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def close(self):
+        """
+        stop publishing and destroy the shared memory block
+        """
+        self.stop()
+        self.controller.remove_listener(self.publish)
+        del self.header, self.latest, self.history
+        self.shm.close()
+        self.shm.unlink()
+        published.discard(self.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class SnapshotReader(object):
+    """
+    read the readings published by a SnapshotPublisher, from any process
+    """
+    timeout = 1 # max time to get a consistent copy (s), a write takes microseconds
+
+    def __init__(self, name):
+        """
+        Parameters
+        ----------
+        name : string
+            name of the shared memory block (SnapshotPublisher.name)
+        """
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError: # Python < 3.13: the block must not be destroyed when this process ends
+            self.shm = shared_memory.SharedMemory(name=name)
+            if name not in published:
+                self.untrack()
+        self.name = name
+        header = np.ndarray(1, dtype=HEADER, buffer=self.shm.buf)
+        self.capacity = int(header['capacity'][0])
+        self.header, self.latest_sample, self.history_samples = layout(self.shm.buf, self.capacity)
+
+    def untrack(self):
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+        except Exception:
+            pass
+
+    def read(self, copy):
+        # consistent copy of the data returned by copy(count)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            seq = int(self.header['seq'][0])
+            if not seq & 1:
+                count = int(self.header['count'][0])
+                data = copy(count)
+                if int(self.header['seq'][0]) == seq:
+                    return count, data
+            if time.monotonic() > deadline:
+                # e.g. the writer process died in the middle of a write
+                raise TimeoutError(f'no consistent copy of {self.name} after {self.timeout} s, '
+                                   'the publisher is not responding')
+            time.sleep(0)
+
+    @property
+    def count(self):
+        """
+        number of readings published so far
+        """
+        return int(self.header['count'][0])
+
+    def latest(self):
+        """
+        last published reading
+
+        Returns
+        -------
+        reading : Reading
+            None if nothing was published yet
+
+        Raises
+        ------
+        TimeoutError
+            if the block stays locked by the writer for more than the timeout attribute
+        """
+        count, sample = self.read(lambda count: self.latest_sample[0].copy())
+        if count == 0:
+            return None
+        T = round(float(sample['temperature']), 1)
+        SB1, EB1 = int(sample['status']), int(sample['error'])
+        raw = bytes(sample['raw'])
+        return Reading(float(sample['time']), raw, None if T != T else T,
+                       status_message(SB1), error_message(EB1), SB1, EB1,
+                       stale=not valid_T_reply(raw))
+
+    def history(self, n=None):
+        """
+        last published readings
+
+        Parameters
+        ----------
+        n : int, optional
+            max number of readings. The default is the whole history.
+
+        Returns
+        -------
+        samples : numpy.ndarray
+            time, temperature, status, error and raw reply of the readings, oldest first
+
+        Raises
+        ------
+        TimeoutError
+            if the block stays locked by the writer for more than the timeout attribute
+        """
+        def copy(count):
+            size = min(count, self.capacity)
+            if n is not None:
+                size = min(size, n)
+            indexes = np.arange(count - size, count) % self.capacity
+            return self.history_samples[indexes]
+        return self.read(copy)[1]
+
+    def wait(self, count, timeout=None, poll=0.01):
+        """
+        wait for a reading newer than the first count readings
+
+        Returns
+        -------
+        new : bool
+            False if the timeout was reached
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.count <= count:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(poll)
+        return True
+
+    def close(self):
+        del self.header, self.latest_sample, self.history_samples
+        self.shm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+Simulated T9x controller, to run PyLinkam without hardware.
+
+SimulatedSerial can be passed as the transport of a programmer, PtySimulator
+serves the simulated controller on a pseudo terminal so that the serial.Serial
+path of programmer is used as with a real controller (Linux and macOS only).
+"""
+import os
+import threading
+from collections import deque
+import time
+
+from .PyLinkam import programmer
+
+
+class SimulatedController(object):
+    """
+    model of a T9x programmer answering the T, R1, L1, S, E and O commands
+
+    The temperature follows the commanded rate towards the limit, the 'T'
+    reply has the documented layout: SB1, EB1, PB1, GS1, 2 unused bytes and
+    the temperature*10 as a signed 16 bits ASCII hex value.
+    """
+    def __init__(self, temperature=25, rate=0, limit=25, speed=1):
+        """
+        Parameters
+        ----------
+        temperature : float, optional
+            initial temperature (°C). The default is 25.
+        rate : float, optional
+            initial rate (°C/min). The default is 0.
+        limit : float, optional
+            initial limit (°C). The default is 25.
+        speed : float, optional
+            speed of the simulated time compared to real time. The default is 1.
+        """
+        self.temperature = temperature
+        self.rate = rate
+        self.limit = limit
+        self.speed = speed
+        self.SB1 = 0x01 # stopped
+        self.EB1 = 0x80 # bit 7 is set by default
+        self.PB1 = 0x80 # LNP stopped
+        self.GS1 = 0x80
+        self.commands = deque(maxlen=1000) # last commands received
+        self.t = time.monotonic()
+        self.lock = threading.Lock()
+
+    def update(self):
+        """
+        move the temperature according to the current status
+        """
+        now = time.monotonic()
+        dt = (now - self.t)*self.speed
+        self.t = now
+        if self.SB1 in (0x10, 0x20):
+            step = self.rate*dt/60
+            if abs(self.limit - self.temperature) <= step:
+                self.temperature = self.limit
+                self.SB1 = 0x30 # limit reached
+            elif self.SB1 == 0x10:
+                self.temperature += step
+            else:
+                self.temperature -= step
+
+    def T_reply(self):
+        """
+        reply to the 'T' command, without the carriage return
+        """
+        T = int(round(self.temperature*10)) & 0xFFFF
+        return bytes([self.SB1, self.EB1, self.PB1, self.GS1, 0x80, 0x80]) + b'%04X' % T
+
+    def handle(self, command):
+        """
+        run a command and return the reply
+
+        Parameters
+        ----------
+        command : bytes
+            command without the carriage return
+
+        Returns
+        -------
+        reply : bytes
+            reply ending with a carriage return
+        """
+        with self.lock:
+            self.update()
+            self.commands.append(command)
+            if command == b'T':
+                return self.T_reply() + b'\r'
+            if command.startswith(b'R1'):
+                self.rate = int(command[2:])/100
+            elif command.startswith(b'L1'):
+                self.limit = int(command[2:])/10
+            elif command == b'S':
+                if self.limit > self.temperature:
+                    self.SB1 = 0x10
+                elif self.limit < self.temperature:
+                    self.SB1 = 0x20
+                else:
+                    self.SB1 = 0x30
+            elif command == b'E':
+                self.SB1 = 0x01
+            elif command == b'O':
+                self.SB1 = 0x40 if self.temperature == self.limit else 0x50
+            # commands that do not return data are acknowledged with a carriage return
+            return b'\r'
+
+
+class SimulatedSerial(object):
+    """
+    in-process serial-like transport connected to a SimulatedController
+
+    Replies are available latency seconds after the command was written.
+    """
+    def __init__(self, controller=None, latency=0.002, timeout=programmer.timeout):
+        """
+        Parameters
+        ----------
+        controller : SimulatedController, optional
+            simulated controller. The default is a new SimulatedController.
+        latency : float, optional
+            time in seconds between a command and its reply. The default is 0.002.
+        timeout : float, optional
+            read timeout in seconds. The default is programmer.timeout.
+        """
+        if controller is None:
+            controller = SimulatedController()
+        self.controller = controller
+        self.latency = latency
+        self.timeout = timeout
+        self.is_open = True
+        self.pending = b'' # bytes written, not yet ended by a carriage return
+        self.replies = [] # (time at which the reply is available, reply)
+        self.buffer = b'' # reply bytes available for reading
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.condition = threading.Condition()
+
+    def write(self, data):
+        if not self.is_open:
+            raise IOError('port is closed')
+        self.bytes_out += len(data)
+        self.pending += data
+        *commands, self.pending = self.pending.split(b'\r')
+        with self.condition:
+            for command in commands:
+                self.replies.append((time.monotonic() + self.latency,
+                                     self.controller.handle(command)))
+            self.condition.notify_all()
+        return len(data)
+
+    def _collect(self):
+        # move the replies that are due to the read buffer
+        now = time.monotonic()
+        while self.replies and self.replies[0][0] <= now:
+            self.buffer += self.replies.pop(0)[1]
+
+    @property
+    def in_waiting(self):
+        with self.condition:
+            self._collect()
+            return len(self.buffer)
+
+    def read_until(self, expected=b'\r', size=None):
+        deadline = time.monotonic() + self.timeout
+        with self.condition:
+            while True:
+                self._collect()
+                i = self.buffer.find(expected) if expected else -1
+                if i >= 0:
+                    n = i + len(expected)
+                    break
+                if size is not None and len(self.buffer) >= size:
+                    n = size
+                    break
+                now = time.monotonic()
+                if now >= deadline:
+                    n = len(self.buffer)
+                    break
+                wait = deadline - now
+                if self.replies:
+                    wait = min(wait, max(0, self.replies[0][0] - now))
+                self.condition.wait(wait)
+            if size is not None:
+                n = min(n, size)
+            answer, self.buffer = self.buffer[:n], self.buffer[n:]
+        self.bytes_in += len(answer)
+        return answer
+
+    def read(self, size=1):
+        return self.read_until(b'', size)
+
+    def reset_input_buffer(self):
+        with self.condition:
+            self.buffer = b''
+            self.replies = []
+
+    def close(self):
+        self.is_open = False
+
+
+class PtySimulator(object):
+    """
+    simulated controller served on a pseudo terminal, whose port can be opened
+    with serial.Serial like a real controller
+    """
+    def __init__(self, controller=None, latency=0.002):
+        """
+        Parameters
+        ----------
+        controller : SimulatedController, optional
+            simulated controller. The default is a new SimulatedController.
+        latency : float, optional
+            time in seconds between a command and its reply. The default is 0.002.
+        """
+        import tty
+        if controller is None:
+            controller = SimulatedController()
+        self.controller = controller
+        self.latency = latency
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.master)
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.on = True
+        self.thread = threading.Thread(target=self.run, args=())
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        import select
+        pending = b''
+        while self.on:
+            ready, _, _ = select.select([self.master], [], [], 0.1)
+            if not ready:
+                continue
+            try:
+                pending += os.read(self.master, 1024)
+            except OSError:
+                break
+            *commands, pending = pending.split(b'\r')
+            for command in commands:
+                reply = self.controller.handle(command)
+                if self.latency:
+                    time.sleep(self.latency)
+                os.write(self.master, reply)
+
+    def close(self):
+        self.on = False
+        self.thread.join()
+        os.close(self.master)
+        os.close(self.slave)
+
+
+def simulated_programmer(latency=0.002, **kwargs):
+    """
+    programmer connected to a simulated controller
+
+    Parameters
+    ----------
+    latency : float, optional
+        time in seconds between a command and its reply. The default is 0.002.
+    **kwargs :
+        arguments of SimulatedController
+
+    Returns
+    -------
+    prog : programmer
+        the simulated controller is prog.ser.controller
+    """
+    return programmer('simulator', transport=SimulatedSerial(SimulatedController(**kwargs), latency))
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming of the limit (set-point) from an external signal, for closed-loop control.
+
+The external loop pushes targets at any rate, a writer thread sends only the
+latest one, as soon as the link allows: min_delay after the previous command,
+whichever thread sent it, then its acknowledgement is read right away.
+Targets older than max_age when the link gets free are dropped rather than
+sent late, and targets that would not change the limit at its 0.1°C
+resolution are skipped.
+"""
+import collections
+import threading
+import time
+
+from .PyLinkam import MAX_LIMIT, limit_command
+
+
+class SetpointStream(object):
+    """
+    latest-value-wins stream of limits sent to a controller
+    """
+    def __init__(self, controller, max_age=0.5, history=1000, min_delay=None):
+        """
+        Parameters
+        ----------
+        controller : programmer
+            controller receiving the limits
+        max_age : float, optional
+            targets older than max_age seconds when they could be sent are
+            dropped. The default is 0.5.
+        history : int, optional
+            number of latencies kept for the statistics. The default is 1000.
+        min_delay : float, optional
+            min time in seconds between a limit and the previous command. The 
+            default is controller.min_delay, the delay required by the 
+            documentation, shorter delays rely on the controller buffering 
+            the commands (see programmer.batch).
+        """
+        self.controller = controller
+        self.max_age = max_age
+        self.min_delay = controller.min_delay if min_delay is None else min_delay
+        self.condition = threading.Condition()
+        self.target = None # (limit, monotonic time of the push) waiting to be sent
+        self.last_sent = None # last limit sent, in 0.1°C
+        self.latencies = collections.deque(maxlen=history)
+        self.received = 0
+        self.sent = 0
+        self.superseded = 0 # targets replaced by a newer one before being sent
+        self.stale = 0 # targets dropped because older than max_age
+        self.unchanged = 0 # targets equal to the limit already sent
+        self.rejected = 0 # targets out of range
+        self.errors = 0
+        self.t_start = None
+        self.on = False
+        self.thread = None
+
+    def push(self, limit, t=None):
+        """
+        set a new target limit, replacing the one waiting to be sent if any
+
+        Parameters
+        ----------
+        limit : float
+            target limit (°C)
+        t : float, optional
+            time.monotonic() at which the target was measured, to account for
+            the delay of the external loop. The default is now.
+        """
+        if t is None:
+            t = time.monotonic()
+        with self.condition:
+            self.received += 1
+            if not limit < MAX_LIMIT:
+                self.rejected += 1
+                return
+            if self.target is not None:
+                self.superseded += 1
+            self.target = (limit, t)
+            self.condition.notify()
+
+    def start(self):
+        """
+        start sending the targets from a background thread
+        """
+        self.on = True
+        self.t_start = time.monotonic()
+        self.thread = threading.Thread(target=self.run, args=())
+        self.thread.daemon = True
+        self.thread.start()
+
+    def keep(self, limit, t):
+        # False for a target older than max_age or not changing the limit,
+        # counted as such. Called with the condition held.
+        if time.monotonic() - t > self.max_age:
+            self.stale += 1
+            return False
+        if round(limit*10) == self.last_sent:
+            self.unchanged += 1
+            return False
+        return True
+
+    def run(self):
+        """
+        method run in the writer thread
+        """
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.target is not None or not self.on)
+                if not self.on:
+                    return
+                (limit, t), self.target = self.target, None
+                if not self.keep(limit, t):
+                    continue
+            controller = self.controller
+            try:
+                with controller.lock:
+                    # other threads may have held the lock for a while: send the
+                    # latest target, if still fresh
+                    with self.condition:
+                        if self.target is not None:
+                            self.superseded += 1
+                            (limit, t), self.target = self.target, None
+                        if not self.keep(limit, t):
+                            continue
+                    controller.write(limit_command(limit), self.min_delay)
+                    answer, ack = controller.read_reply()
+                    if ack:
+                        controller.limit = limit
+            except Exception:
+                self.errors += 1
+                continue
+            latency = time.monotonic() - t
+            with self.condition:
+                if ack:
+                    self.sent += 1
+                    self.last_sent = round(limit*10)
+                    self.latencies.append(latency)
+                else:
+                    self.errors += 1
+
+    def stop(self):
+        """
+        stop the writer thread, the target waiting to be sent is dropped
+        """
+        with self.condition:
+            self.on = False
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def stats(self):
+        """
+        Returns
+        -------
+        stats : dict
+            counts of the targets received, sent, superseded, stale, unchanged,
+            rejected and failed; achieved update rate (Hz) and end-to-end
+            latency from push to acknowledgement (mean, p50, p99, max in s)
+        """
+        with self.condition:
+            latencies = sorted(self.latencies)
+            duration = 0 if self.t_start is None else time.monotonic() - self.t_start
+            stats = {'received': self.received,
+                     'sent': self.sent,
+                     'superseded': self.superseded,
+                     'stale': self.stale,
+                     'unchanged': self.unchanged,
+                     'rejected': self.rejected,
+                     'errors': self.errors,
+                     'update_rate': self.sent/duration if duration > 0 else None}
+        n = len(latencies)
+        stats['latency'] = {'mean': sum(latencies)/n if n else None,
+                            'p50': latencies[n//2] if n else None,
+                            'p99': latencies[min(n - 1, int(0.99*n))] if n else None,
+                            'max': latencies[-1] if n else None}
+        return stats
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
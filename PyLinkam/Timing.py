@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Drift-free scheduling of periodic samples.
+"""
+import time
+from time import sleep
+
+
+class SampleClock(object):
+    """
+    periodic deadlines set on time.monotonic()
+
+    The deadline of the n-th sample is start + n*interval, so the time spent
+    querying the controller and writing to file does not shift the following
+    samples. When a deadline is missed by more than one interval, the skipped
+    deadlines are counted in missed and the clock catches up on the grid.
+    """
+    def __init__(self, interval):
+        """
+        Parameters
+        ----------
+        interval : float
+            time in seconds between two samples
+        """
+        self.interval = interval
+        self.start = None # monotonic time of the first deadline
+        self.next = 0 # index of the next deadline
+        self.count = 0 # number of samples
+        self.missed = 0 # number of deadlines skipped
+        self.jitter = 0 # delay of the last sample after its deadline (s)
+        self.max_jitter = 0
+        self.total_jitter = 0
+
+    def time_left(self):
+        """
+        time in seconds until the next deadline (0 if it is over)
+        """
+        if self.start is None:
+            return 0
+        return max(0, self.start + self.next*self.interval - time.monotonic())
+
+    def wait(self):
+        """
+        sleep until the next deadline
+
+        Returns
+        -------
+        jitter : float
+            delay in seconds between the deadline and the actual time
+        """
+        now = time.monotonic()
+        if self.start is None:
+            self.start = now
+        deadline = self.start + self.next*self.interval
+        if now < deadline:
+            sleep(deadline - now)
+            now = time.monotonic()
+        late = int((now - deadline)//self.interval)
+        if late > 0:
+            # skip the deadlines that are already over
+            self.missed += late
+            self.next += late
+            deadline += late*self.interval
+        self.next += 1
+        self.count += 1
+        self.jitter = now - deadline
+        self.max_jitter = max(self.max_jitter, self.jitter)
+        self.total_jitter += self.jitter
+        return self.jitter
+
+    @property
+    def mean_jitter(self):
+        """
+        mean delay of the samples after their deadline (s)
+        """
+        if self.count == 0:
+            return 0
+        return self.total_jitter/self.count
+
+    def __repr__(self):
+        return (f'SampleClock(interval={self.interval}, count={self.count}, missed={self.missed}, '
+                f'mean_jitter={self.mean_jitter:.6f}, max_jitter={self.max_jitter:.6f})')
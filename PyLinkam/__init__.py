@@ -4,7 +4,25 @@ Created on Wed Mar 24 11:04:31 2021
 
 @author: ebel
 """
+import importlib
 
 from .PyLinkam import programmer
-from .Pyqt_App import ControllerDisplay
-from .Pyqt_Widget import  ControllerThread, ControllerSimple
\ No newline at end of file
+
+# attributes imported on first use, so that the programmer can be used without PyQt5
+LAZY = {'ControllerDisplay': 'Pyqt_App',
+        'ControllerThread': 'Pyqt_Widget',
+        'ControllerPoller': 'Pyqt_Widget',
+        'ControllerSimple': 'Pyqt_Widget'}
+
+
+def __getattr__(name):
+    if name in LAZY:
+        module = importlib.import_module('.' + LAZY[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__():
+    return sorted(list(globals()) + list(LAZY))
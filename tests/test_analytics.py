@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the ramp analytics.
+"""
+import threading
+
+import numpy as np
+
+from PyLinkam.Analytics import RampTracker
+from PyLinkam.Simulator import simulated_programmer
+
+
+def test_rate_precision_over_a_long_run():
+    # 200000 samples at 1 Hz (more than 2 days) of 6°C/min ramps, with noise
+    tracker = RampTracker(window=30)
+    i = np.arange(200000)
+    t = 1.79e9 + i*1.0
+    T = 25 + (i % 600)*0.1 + 1e-3*(i % 7)
+    for t_i, T_i in zip(t.tolist(), T.tolist()):
+        slope = tracker.regression(t_i, T_i)
+    expected = np.polyfit(t[-30:] - t[-30], T[-30:], 1)[0]
+    assert abs(slope - expected) < 1e-9*abs(expected)
+
+
+def test_snapshots_from_many_threads():
+    prog = simulated_programmer(latency=0.0005, speed=60)
+    tracker = prog.enable_analytics(window=10)
+    prog.setup(rate=10, limit=200)
+    readings = []
+
+    def poll():
+        for i in range(50):
+            readings.append(prog.snapshot())
+    threads = [threading.Thread(target=poll) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(reading.analytics is not None for reading in readings)
+    # each 'T' reply goes through the tracker at most once, replies older
+    # than the last one are skipped
+    sequences = [reading.sequence for reading in readings]
+    assert tracker.count <= len(set(sequences))
+    assert prog.last_reading.sequence == max(sequences)
+    assert len(tracker.samples) == 10
+    assert tracker.state.rate_ewma > 0 # heating
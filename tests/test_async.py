@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of AsyncProgrammer against the simulated controller.
+"""
+import asyncio
+
+from PyLinkam.Async_Programmer import AsyncProgrammer
+from PyLinkam.Simulator import SimulatedController
+
+
+class LoopbackWriter(object):
+    """
+    asyncio writer passing the commands to a simulated controller, whose
+    replies are fed to the reader after delays[i] seconds for the i-th command,
+    or never if delays[i] is None
+    """
+    def __init__(self, reader, controller, delays=()):
+        self.reader = reader
+        self.controller = controller
+        self.delays = list(delays)
+
+    def write(self, data):
+        reply = self.controller.handle(data.rstrip(b'\r'))
+        delay = self.delays.pop(0) if self.delays else 0.001
+        if delay is not None:
+            asyncio.get_running_loop().call_later(delay, self.reader.feed_data, reply)
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def run(delays, corrupt=0):
+    async def main():
+        reader = asyncio.StreamReader()
+        controller = SimulatedController(temperature=120)
+        writer = LoopbackWriter(reader, controller, delays)
+        prog = AsyncProgrammer(reader, writer)
+        prog.timeout = 0.02
+        first = await prog.snapshot()
+        await prog.stop()
+        second = await prog.snapshot()
+        return first, second, list(controller.commands)
+    return asyncio.run(main())
+
+
+def test_late_reply_is_not_taken_for_the_next_one():
+    # the first 'T' reply comes after the timeout: dropped, the query is sent again
+    first, second, commands = run([0.03])
+    assert not first.stale and first.temperature == 120
+    assert commands == [b'T', b'T', b'E', b'T']
+    assert second.SB1 == 0x01 and not second.stale
+
+
+def test_no_valid_reply_gives_a_stale_reading():
+    first, second, commands = run([None]*3)
+    assert first.stale
+    assert commands[:3] == [b'T', b'T', b'T']
+    assert not second.stale
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of programmer.batch against the simulated controller.
+"""
+import time
+
+from PyLinkam.Simulator import simulated_programmer
+
+
+def run_batch(prog, delay=None):
+    prog.query('T')
+    t0 = time.monotonic()
+    with prog.batch(delay) as batch:
+        prog.set_rate(10)
+        prog.set_limit(100)
+        prog.start()
+    return batch, prog.last_write - t0
+
+
+def test_batch_commands_are_spaced_by_min_delay():
+    prog = simulated_programmer()
+    batch, duration = run_batch(prog)
+    assert batch.ok and batch.commands == ['R11000', 'L11000', 'S']
+    assert batch.delay == prog.min_delay
+    # the first command follows the 'T' query by min_delay too
+    assert duration >= 3*prog.min_delay - prog.latency
+
+
+def test_batch_delay():
+    prog = simulated_programmer()
+    batch, duration = run_batch(prog, delay=0.002)
+    assert batch.ok and batch.delay == 0.002
+    assert duration < 3*prog.min_delay
+    assert list(prog.ser.controller.commands)[-3:] == [b'R11000', b'L11000', b'S']
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Round trip of a capture: programmer.capture, then read_capture, replay,
+decode_capture and ReplayTransport.
+"""
+import pytest
+
+from PyLinkam.Capture import ReplayTransport, decode_capture, read_capture, replay
+from PyLinkam.PyLinkam import REPLY, REQUEST, programmer
+from PyLinkam.Simulator import simulated_programmer
+
+
+def record(file):
+    prog = simulated_programmer(speed=600, temperature=30)
+    prog.capture(file)
+    readings = [prog.snapshot()]
+    batch = prog.setup(rate=10, limit=100) # 3 requests, then 3 replies in a row
+    readings += [prog.snapshot() for i in range(3)]
+    prog.stop()
+    readings.append(prog.snapshot())
+    prog.stop_capture()
+    return readings, batch
+
+
+def test_read_capture(tmp_path):
+    file = str(tmp_path/'run.cap')
+    readings, batch = record(file)
+    assert batch.ok
+    offset, frames = read_capture(file)
+    directions = [direction for t, direction, data in frames]
+    assert directions[2:8] == [REQUEST]*3 + [REPLY]*3
+    assert [data for t, direction, data in frames if direction == REQUEST] == [
+        b'T\r', b'R11000\r', b'L11000\r', b'S\r', b'T\r', b'T\r', b'T\r', b'E\r', b'T\r']
+    times = [t for t, direction, data in frames]
+    assert times == sorted(times)
+
+
+def test_replay_and_decode(tmp_path):
+    file = str(tmp_path/'run.cap')
+    readings, batch = record(file)
+    replayed = list(replay(file))
+    assert [r.raw for r in replayed] == [r.raw for r in readings]
+    assert [r.temperature for r in replayed] == [r.temperature for r in readings]
+    assert all(abs(r.timestamp - original.timestamp) < 0.05
+               for r, original in zip(replayed, readings))
+    decoded = decode_capture(file)
+    assert decoded['valid'].all()
+    assert decoded['temperature'].tolist() == pytest.approx([r.temperature for r in readings])
+    assert decoded['status'].tolist() == [r.SB1 for r in readings]
+
+
+def test_replay_transport(tmp_path):
+    file = str(tmp_path/'run.cap')
+    readings, batch = record(file)
+    transport = ReplayTransport(file)
+    prog = programmer('replay', transport=transport)
+    prog.min_delay = 0
+    replayed = [prog.snapshot()]
+    replayed_batch = prog.setup(rate=10, limit=100)
+    replayed += [prog.snapshot() for i in range(3)]
+    prog.stop()
+    replayed.append(prog.snapshot())
+    assert replayed_batch.acks == [True, True, True]
+    assert [r.raw for r in replayed] == [r.raw for r in readings]
+    assert transport.mismatches == 0
+    assert not transport.is_open
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the discovery of the controllers, on simulated controllers served
+on pseudo terminals.
+"""
+import os
+
+import pytest
+
+from PyLinkam.Connection import connect, discover
+from PyLinkam.PyLinkam import serial_port
+from PyLinkam.Simulator import PtySimulator
+
+pytestmark = pytest.mark.skipif(os.name != 'posix', reason='pseudo terminals need Linux or macOS')
+
+
+def test_discovery_skips_connected_ports():
+    simulators = [PtySimulator(), PtySimulator()]
+    ports = [sim.port for sim in simulators]
+    opened = []
+
+    def opener(port, baudrate, timeout):
+        opened.append(port)
+        return serial_port(port, baudrate, timeout)
+    try:
+        first = connect(ports=ports, opener=opener)
+        assert first.port == ports[0]
+        del opened[:]
+        assert discover(ports, opener=opener) == ports[1:]
+        second = connect(ports=ports, opener=opener)
+        assert second.port == ports[1]
+        # the port of the first connection was never opened again
+        assert ports[0] not in opened
+        assert first.snapshot().stale is False
+        with pytest.raises(OSError):
+            connect(ports=ports, opener=opener)
+        first.ser.close()
+        second.ser.close()
+    finally:
+        for sim in simulators:
+            sim.close()
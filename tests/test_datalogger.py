@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the binary, csv and archive loggers.
+"""
+import time
+
+import numpy as np
+
+from PyLinkam.Datalogger import ArchiveLogger, ArchiveReader, BinaryLogger, CSVLogger, read_log
+
+
+def test_binary_and_csv_loggers(tmp_path):
+    with BinaryLogger(str(tmp_path/'log.bin')) as logger:
+        logger.append_sample(1.0, 25.0, 0x10, 0x80)
+    with CSVLogger(str(tmp_path/'log.csv')) as logger:
+        logger.append_sample(1.0, 25.0, 0x10, 0x80)
+    assert read_log(str(tmp_path/'log.bin'))['temperature'].tolist() == [25.0]
+    assert (tmp_path/'log.csv').read_text().startswith('0.0, 25.0, heating')
+
+
+def test_archive_is_readable_while_logging(tmp_path):
+    file = str(tmp_path/'run.pylk')
+    logger = ArchiveLogger(file, chunk_size=4096, flush_interval=0.02, chunk_interval=0.1)
+    try:
+        for i in range(10):
+            logger.append_sample(1000.0 + i, 20.0 + i, 0x10, 0x80, 10, 100)
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            with ArchiveReader(file) as archive:
+                if len(archive) == 10:
+                    break
+            time.sleep(0.02)
+        with ArchiveReader(file) as archive:
+            samples = archive.read(start=1002, end=1004)
+        assert samples['temperature'].tolist() == [22.0, 23.0, 24.0]
+        assert np.all(samples['limit'] == 100)
+    finally:
+        logger.close()
+    with ArchiveReader(file) as archive:
+        assert len(archive) == 10
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Regression tests of the decoding of the 'T' reply.
+"""
+import numpy as np
+
+from PyLinkam.PyLinkam import (ErrorFlag, ERROR_MESSAGES, decode_many, decode_reading,
+                               error_flags, error_message, temperature_value)
+
+
+def test_error_byte_combinations():
+    # bit 7 is set by default, bits 0 and 1 are errors
+    assert error_flags(0x83) == ErrorFlag.COOLING_RATE | ErrorFlag.OPEN_CIRCUIT
+    assert error_message(0x83) == (ERROR_MESSAGES[ErrorFlag.COOLING_RATE]
+                                   + ERROR_MESSAGES[ErrorFlag.OPEN_CIRCUIT])
+    assert error_message(0x80) == 'no error'
+    assert error_flags(0xC0) == ErrorFlag(0) # bit 6 is not connected
+    assert error_message(0xA0) == ERROR_MESSAGES[ErrorFlag.LINK_ERROR]
+
+
+def test_negative_temperatures():
+    assert temperature_value(b'F858') == -196.0
+    assert temperature_value(b'f858') == -196.0
+    assert temperature_value(b'FFFF') == -0.1
+    assert temperature_value(b'04B0') == 120.0
+    assert decode_reading(b'\x20\x80\x80\x80\x80\x80F858', 0).temperature == -196.0
+
+
+def test_decode_many_invalid_replies():
+    replies = [b'\x10\x80\x80\x80\x80\x80' + b'04B0', # 120.0°C
+               b'\x20\x80\x80\x80\x80\x80' + b'F858', # -196.0°C
+               b'\x10\x80\x80', # short
+               b'\x10\x80\x80\x80\x80\x80' + b'04XZ', # not hex
+               b'']
+    decoded = decode_many(replies)
+    assert decoded['valid'].tolist() == [True, True, False, False, False]
+    assert decoded['temperature'][:2].tolist() == [120.0, -196.0]
+    assert np.isnan(decoded['temperature'][2:]).all()
+    assert decoded['status'][:2].tolist() == [0x10, 0x20]
+
+
+def test_decode_many_array():
+    data = np.frombuffer(b'\x10\x80\x80\x80\x80\x80' + b'F858'
+                         + b'\x10\x80\x80\x80\x80\x80' + b'00G0', dtype=np.uint8).reshape(2, 10)
+    decoded = decode_many(data)
+    assert decoded['valid'].tolist() == [True, False]
+    assert decoded['temperature'][0] == -196.0 and np.isnan(decoded['temperature'][1])
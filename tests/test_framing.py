@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Loopback tests of the carriage return framing of programmer.read/write/query,
+against the simulated controller.
+"""
+import os
+import time
+
+import pytest
+
+from PyLinkam.PyLinkam import programmer, valid_T_reply
+from PyLinkam.Simulator import SimulatedController, SimulatedSerial, PtySimulator
+
+# round trip of the former query: 8 ms sleep, then readline() waiting for a
+# line feed that never comes, i.e. the whole 0.01 s read timeout
+LEGACY_ROUND_TRIP = 0.008 + 0.01
+
+
+def median(values):
+    return sorted(values)[len(values)//2]
+
+
+def test_write_ends_commands_with_cr():
+    controller = SimulatedController()
+    prog = programmer('loopback', transport=SimulatedSerial(controller))
+    prog.write('T')
+    prog.write('L11000')
+    assert list(controller.commands) == [b'T', b'L11000']
+    assert prog.ser.bytes_out == len(b'T\rL11000\r')
+
+
+def test_read_stops_at_cr_and_strips_it():
+    prog = programmer('loopback', transport=SimulatedSerial(latency=0.001))
+    prog.write('T')
+    prog.write('E')
+    answer, complete = prog.read_reply()
+    assert complete and valid_T_reply(answer) and not answer.endswith(b'\r')
+    # the acknowledgement of the second command is a frame of its own
+    assert prog.read_reply() == (b'', True)
+
+
+def test_incomplete_reply_after_timeout():
+    ser = SimulatedSerial(timeout=0.05)
+    prog = programmer('loopback', transport=ser)
+    ser.buffer = b'\x10\x80\x80' # truncated frame, no carriage return
+    t0 = time.monotonic()
+    answer, complete = prog.read_reply()
+    assert (answer, complete) == (b'\x10\x80\x80', False)
+    assert time.monotonic() - t0 >= 0.05
+
+
+def test_query_returns_on_cr_not_on_timeout():
+    # a long timeout: the reply has to end the read, not the timeout
+    prog = programmer('loopback', transport=SimulatedSerial(latency=0.002, timeout=1))
+    latencies = []
+    for i in range(20):
+        t0 = time.monotonic()
+        answer = prog.query('T')
+        latencies.append(time.monotonic() - t0)
+        assert valid_T_reply(answer)
+    assert median(latencies) < LEGACY_ROUND_TRIP
+    assert prog.latency < 0.5
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='pseudo terminals need Linux or macOS')
+def test_query_over_pty():
+    sim = PtySimulator(latency=0.002)
+    try:
+        prog = programmer(sim.port)
+        latencies = []
+        for i in range(20):
+            t0 = time.monotonic()
+            answer = prog.query('T')
+            latencies.append(time.monotonic() - t0)
+            assert valid_T_reply(answer)
+        assert prog.query('E') == b''
+        assert median(latencies) < LEGACY_ROUND_TRIP
+        prog.ser.close()
+    finally:
+        sim.close()
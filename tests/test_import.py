@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+"""
+'import PyLinkam' has to stay light: no NumPy, no Qt.
+"""
+import subprocess
+import sys
+
+from PyLinkam.Benchmark import package_env
+
+
+def test_import_does_not_load_numpy_or_qt():
+    check = ("import sys, PyLinkam; "
+             "print(' '.join(name for name in ('numpy', 'PyQt5') if name in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', check], env=package_env(),
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.split() == []
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the metrics of the serial I/O against the simulated controller.
+"""
+import re
+
+from PyLinkam.Metrics import prometheus_text
+from PyLinkam.Simulator import simulated_programmer
+
+
+def faulty_programmer(replies):
+    # the 'T' commands get the given replies first (None for the simulated
+    # one), then the simulated ones
+    prog = simulated_programmer(temperature=42)
+    prog.ser.timeout = 0.02
+    controller = prog.ser.controller
+    handle = controller.handle
+    replies = list(replies)
+
+    def faulty_handle(command):
+        reply = handle(command)
+        if command == b'T' and replies:
+            faulty = replies.pop(0)
+            return reply if faulty is None else faulty
+        return reply
+    controller.handle = faulty_handle
+    return prog
+
+
+def test_counters_of_empty_and_truncated_replies():
+    # first snapshot: empty, truncated, then valid reply; second one: no reply at all
+    prog = faulty_programmer([b'', b'\x10\x80\x80', None] + [b'']*3)
+    metrics = prog.enable_metrics()
+    first = prog.snapshot()
+    assert not first.stale and first.temperature == 42
+    second = prog.snapshot()
+    assert second.stale and second.temperature == 42
+    stats = prog.stats()
+    assert stats['queries'] == 6
+    assert stats['empty_replies'] == 4
+    assert stats['short_replies'] == 1
+    assert stats['retries'] == 4
+    assert stats['stale_readings'] == 1
+    assert stats['round_trip']['count'] == 6
+
+    text = prometheus_text([metrics])
+    assert 'pylinkam_empty_replies_total{port="simulator"} 4\n' in text
+    assert 'pylinkam_short_replies_total{port="simulator"} 1\n' in text
+    assert 'pylinkam_retries_total{port="simulator"} 4\n' in text
+    assert 'pylinkam_stale_readings_total{port="simulator"} 1\n' in text
+    buckets = re.findall(r'pylinkam_round_trip_seconds_bucket\{port="simulator",le="([^"]+)"\} (\d+)', text)
+    counts = [int(n) for le, n in buckets]
+    assert len(buckets) == len(metrics.histograms['round_trip'].bounds) + 1
+    # cumulative counts, the +Inf bucket holding all the observations
+    assert counts == sorted(counts)
+    assert buckets[-1] == ('+Inf', '6')
+    assert 'pylinkam_round_trip_seconds_count{port="simulator"} 6\n' in text
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of ControllerPool against simulated controllers.
+"""
+import threading
+import time
+
+from PyLinkam.Pool import ControllerPool
+from PyLinkam.Simulator import simulated_programmer
+
+
+def test_commands_queued_during_stop_are_run():
+    pool = ControllerPool(interval=0.05)
+    for i in range(3):
+        pool.add(i, simulated_programmer())
+    pool.start()
+    time.sleep(0.1)
+    futures = [pool.submit(0, 'hold') for i in range(20)]
+    stopping = threading.Thread(target=pool.stop)
+    stopping.start()
+    broadcast = pool.broadcast('stop', wait=False)
+    stopping.join(5)
+    assert not stopping.is_alive()
+    for future in futures + list(broadcast.values()):
+        assert future.result(timeout=5) is None
+    assert pool.stop_all()[1].done()
+    pool.close()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of Profile against the simulated controller.
+"""
+import threading
+import time
+
+from PyLinkam.PyLinkam import decode_reading
+from PyLinkam.Profile import Profile
+from PyLinkam.Simulator import simulated_programmer
+
+
+def test_limit_reached_before_the_start_command_is_ignored():
+    prog = simulated_programmer(speed=6000, temperature=30, limit=30)
+    prog.ser.controller.SB1 = 0x30 # end of the previous segment
+    T_bytes, sequence = prog.read_T()
+    profile = Profile(prog, [(10, 100, 0)], verbose=False)
+    start = prog.start
+
+    def late_reading():
+        # 'T' reply read before the start command, decoded and delivered after it
+        profile.listener(decode_reading(T_bytes, time.time(), sequence=sequence))
+
+    def start_then_late_reading():
+        start()
+        threading.Timer(0.05, late_reading).start()
+    prog.start = start_then_late_reading
+    profile.start()
+    assert not profile.wait(0.3)
+    while profile.running:
+        prog.snapshot()
+        time.sleep(0.01)
+    assert prog.last_reading.temperature == 100
+    assert len(profile.timings) == 1
+
+
+def test_stale_reading_does_not_end_the_segment():
+    prog = simulated_programmer(temperature=30, limit=30)
+    prog.ser.controller.SB1 = 0x30 # end of the previous segment
+    last = prog.snapshot()
+    profile = Profile(prog, [(10, 100, 0)], verbose=False)
+    profile.start()
+    while prog.ser.controller.SB1 == 0x30:
+        time.sleep(0.01)
+    # invalid reply to a 'T' written after the start command: the status of
+    # the last valid reading is repeated, not read from the controller
+    stale = decode_reading(b'\x10\x80', time.time(), last=last, sequence=prog.sequence + 1)
+    assert stale.stale and stale.SB1 == 0x30
+    profile.listener(stale)
+    assert not profile.wait(0.3)
+    assert profile.timings == []
+    profile.abort()
+    assert profile.wait(1)
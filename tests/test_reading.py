@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the Reading value object.
+"""
+import copy
+import pickle
+
+import pytest
+
+from PyLinkam.PyLinkam import decode_reading
+
+T_REPLY = b'\x10\x80\x80\x80\x80\x80' + b'04B0' # heating, no error, 120.0°C
+
+
+def test_reading_is_immutable():
+    reading = decode_reading(T_REPLY, 1.0, sequence=3)
+    with pytest.raises(AttributeError):
+        reading.temperature = 0
+    with pytest.raises(AttributeError):
+        del reading.status
+
+
+def test_pickle_and_copy():
+    reading = decode_reading(T_REPLY, 1.0, sequence=3)
+    for clone in (pickle.loads(pickle.dumps(reading)), copy.copy(reading), copy.deepcopy(reading)):
+        assert clone == reading and clone is not reading
+        assert (clone.temperature, clone.SB1, clone.sequence) == (120.0, 0x10, 3)
+    stale = decode_reading(b'', 2.0, reading)
+    assert pickle.loads(pickle.dumps(stale)).stale
+
+
+def test_equality():
+    reading = decode_reading(T_REPLY, 1.0)
+    assert reading == decode_reading(T_REPLY, 1.0)
+    assert reading != decode_reading(T_REPLY, 2.0)
+    assert reading != reading.replace(sequence=1)
+    assert len({reading, decode_reading(T_REPLY, 1.0)}) == 1
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of CommandScheduler against the simulated controller.
+"""
+import queue
+import threading
+import time
+
+import pytest
+
+from PyLinkam.Scheduler import CONTROL, TELEMETRY
+from PyLinkam.Simulator import simulated_programmer
+
+
+def start(function, *args):
+    thread = threading.Thread(target=function, args=args)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+def hold_dispatcher(scheduler):
+    # keep the dispatcher thread busy until the returned event is set
+    gate = threading.Event()
+    running = threading.Event()
+
+    def wait():
+        running.set()
+        gate.wait()
+    start(scheduler.submit, wait, (), CONTROL)
+    running.wait(1)
+    return gate
+
+
+def wait_queued(scheduler, lane, n):
+    deadline = time.monotonic() + 1
+    while scheduler.stats()[lane]['queued'] < n:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_control_commands_jump_queued_telemetry():
+    prog = simulated_programmer()
+    scheduler = prog.enable_scheduler()
+    gate = hold_dispatcher(scheduler)
+    commands = prog.ser.controller.commands
+    telemetry = start(prog.query, 'T')
+    wait_queued(scheduler, 'telemetry', 1)
+    control = start(prog.query, 'E')
+    wait_queued(scheduler, 'control', 1)
+    gate.set()
+    telemetry.join(1)
+    control.join(1)
+    assert list(commands) == [b'E', b'T']
+    prog.disable_scheduler()
+
+
+def test_simultaneous_T_reads_are_deduplicated():
+    prog = simulated_programmer(temperature=42)
+    scheduler = prog.enable_scheduler()
+    gate = hold_dispatcher(scheduler)
+    readings = []
+    threads = [start(lambda: readings.append(prog.snapshot())) for i in range(5)]
+    deadline = time.monotonic() + 1
+    while scheduler.stats()['deduplicated'] < 4:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+    gate.set()
+    for thread in threads:
+        thread.join(1)
+    assert list(prog.ser.controller.commands) == [b'T']
+    assert len(readings) == 5
+    assert len({r.raw for r in readings}) == 1 and readings[0].temperature == 42
+    prog.disable_scheduler()
+
+
+def test_full_telemetry_queue_raises():
+    prog = simulated_programmer()
+    scheduler = prog.enable_scheduler(maxsize=2, timeout=0.05)
+    gate = hold_dispatcher(scheduler)
+    threads = [start(scheduler.submit, time.sleep, (0,)) for i in range(2)]
+    wait_queued(scheduler, 'telemetry', 2)
+    t0 = time.monotonic()
+    with pytest.raises(queue.Full):
+        scheduler.submit(time.sleep, (0,), TELEMETRY)
+    assert time.monotonic() - t0 >= 0.05
+    stats = scheduler.stats()
+    assert stats['blocked'] == 1 and stats['rejected'] == 1
+    # control commands are not bounded
+    control = start(prog.query, 'E')
+    wait_queued(scheduler, 'control', 1)
+    gate.set()
+    for thread in threads + [control]:
+        thread.join(1)
+    assert scheduler.stats()['telemetry']['executed'] == 2
+    prog.disable_scheduler()
+
+
+def test_close_runs_the_queued_requests():
+    prog = simulated_programmer()
+    scheduler = prog.enable_scheduler()
+    gate = hold_dispatcher(scheduler)
+    done = []
+    threads = [start(lambda i=i: done.append(scheduler.submit(lambda: i))) for i in range(3)]
+    wait_queued(scheduler, 'telemetry', 3)
+    closing = start(prog.disable_scheduler)
+    time.sleep(0.01)
+    assert closing.is_alive() # waits for the queued requests
+    gate.set()
+    closing.join(1)
+    for thread in threads:
+        thread.join(1)
+    assert not closing.is_alive()
+    assert sorted(done) == [0, 1, 2]
+    # closed: the queries are run by the calling thread
+    assert scheduler.submit(threading.current_thread) is threading.current_thread()
+    assert prog.query('E') == b''
+
+
+def test_batch_bypasses_the_scheduler():
+    prog = simulated_programmer(temperature=30, speed=600)
+    prog.enable_scheduler()
+    polling = True
+    readings = []
+
+    def poll():
+        while polling:
+            readings.append(prog.snapshot())
+    poller = start(poll)
+    batches = []
+    sender = start(lambda: batches.extend(prog.setup(10, 30 + i) for i in range(5)))
+    sender.join(5)
+    polling = False
+    poller.join(5)
+    assert not sender.is_alive() and not poller.is_alive()
+    assert [b.acks for b in batches] == [[True]*3]*5
+    assert readings and not any(r.stale for r in readings)
+    prog.disable_scheduler()
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of ControllerServer and its clients against the simulated controller.
+"""
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+from PyLinkam.PyLinkam import valid_T_reply
+from PyLinkam.Server import ControllerServer, SocketTransport, connect
+from PyLinkam.Simulator import simulated_programmer
+
+ADDRESSES = ['tcp']
+if os.name == 'posix':
+    ADDRESSES.append('unix')
+
+
+@pytest.fixture(params=ADDRESSES)
+def address(request, tmp_path):
+    if request.param == 'unix':
+        return str(tmp_path/'furnace.sock')
+    return ('127.0.0.1', 0)
+
+
+def serve(address, window=0.1, **kwargs):
+    server = ControllerServer(simulated_programmer(**kwargs), address, window)
+    server.start()
+    return server
+
+
+def test_T_queries_are_coalesced(address):
+    with serve(address, window=1, temperature=42) as server:
+        clients = [connect(server.address) for i in range(8)]
+        readings = [None]*len(clients)
+        barrier = threading.Barrier(len(clients))
+
+        def poll(i):
+            barrier.wait()
+            readings[i] = clients[i].snapshot()
+        threads = [threading.Thread(target=poll, args=(i,)) for i in range(len(clients))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert all(not r.stale and r.temperature == 42 for r in readings)
+        stats = server.stats
+        assert stats['T_requests'] == 8
+        assert stats['T_queries'] == 1 and stats['T_coalesced'] == 7
+        assert stats['clients'] == 8
+        for client in clients:
+            client.ser.close()
+
+
+def test_commands_are_forwarded_in_order(address):
+    with serve(address) as server:
+        controller = server.controller.ser.controller
+        clients = [connect(server.address) for i in range(4)]
+
+        def send(client, i):
+            for j in range(10):
+                client.query(f'R1{i}{j:02d}')
+        threads = [threading.Thread(target=send, args=(client, i))
+                   for i, client in enumerate(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        commands = list(controller.commands)
+        assert len(commands) == 40
+        for i in range(4):
+            # the commands of each client reach the controller in the order they were sent
+            assert [c for c in commands if c.startswith(b'R1%d' % i)] == [
+                b'R1%d%02d' % (i, j) for j in range(10)]
+        for client in clients:
+            client.ser.close()
+
+
+def test_T_after_a_control_command_is_not_cached(address):
+    with serve(address, window=10, temperature=30, limit=100, rate=10) as server:
+        client = connect(server.address)
+        assert client.snapshot().SB1 == 0x01
+        client.start()
+        # within the window, but the cached reply predates the start command
+        assert client.snapshot().SB1 == 0x10
+        client.stop()
+        assert client.snapshot().SB1 == 0x01
+        assert server.stats['T_queries'] == 3
+        client.ser.close()
+
+
+def test_reading_queued_before_a_control_command_is_not_shared(address):
+    with serve(address, window=10, temperature=30, limit=100, rate=10, latency=0.05) as server:
+        first, second = connect(server.address), connect(server.address)
+        reading = []
+        polling = threading.Thread(target=lambda: reading.append(first.snapshot()))
+        polling.start()
+        time.sleep(0.01) # 'T' queued, then 'S' queued behind it
+        second.start()
+        polling.join()
+        assert reading[0].SB1 == 0x01
+        assert second.snapshot().SB1 == 0x10
+        first.ser.close()
+        second.ser.close()
+
+
+def test_socket_transport_timeout():
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    try:
+        transport = SocketTransport(listener.getsockname(), timeout=0.05)
+        peer, _ = listener.accept()
+        # no reply
+        t0 = time.monotonic()
+        assert transport.read_until() == b''
+        assert time.monotonic() - t0 >= 0.05
+        # truncated reply, then the end of the frame
+        peer.sendall(b'\x10\x80')
+        assert transport.read_until() == b'\x10\x80'
+        peer.sendall(b'\x80\x80\r\r')
+        assert transport.read_until() == b'\x80\x80\r'
+        assert transport.read_until() == b'\r'
+        # server gone
+        peer.close()
+        assert transport.read_until() == b''
+        assert not transport.is_open
+        transport.close()
+    finally:
+        listener.close()
+
+
+def test_programmer_over_the_server(address):
+    with serve(address, temperature=-12.5) as server:
+        client = connect(server.address)
+        answer = client.query('T')
+        assert valid_T_reply(answer)
+        assert client.snapshot().temperature == -12.5
+        assert client.query('E') == b''
+        client.ser.close()
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the shared memory publisher and reader.
+"""
+import sys
+import threading
+
+import pytest
+
+from PyLinkam.Shared_Memory import SnapshotPublisher, SnapshotReader
+from PyLinkam.Simulator import simulated_programmer
+
+
+def test_reader_gives_up_on_a_dead_writer():
+    prog = simulated_programmer(temperature=42)
+    publisher = SnapshotPublisher(prog, capacity=16)
+    try:
+        prog.snapshot()
+        reader = SnapshotReader(publisher.name)
+        assert reader.latest().temperature == 42
+        # the writer died in the middle of a write: the sequence number stays odd
+        publisher.header['seq'] += 1
+        reader.timeout = 0.05
+        with pytest.raises(TimeoutError):
+            reader.latest()
+        with pytest.raises(TimeoutError):
+            reader.history()
+        reader.close()
+    finally:
+        publisher.header['seq'] += 1
+        publisher.close()
+
+
+def test_concurrent_publish():
+    prog = simulated_programmer(temperature=42)
+    publisher = SnapshotPublisher(prog, capacity=16)
+    reading = prog.snapshot()
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6) # switch threads in the middle of the writes
+    try:
+        threads = [threading.Thread(target=lambda: [publisher.publish(reading) for i in range(500)])
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        count = int(publisher.header['count'][0])
+        assert count == 1 + 4*500
+        assert int(publisher.header['seq'][0]) == 2*count
+        reader = SnapshotReader(publisher.name)
+        assert reader.latest().temperature == 42
+        reader.close()
+    finally:
+        sys.setswitchinterval(interval)
+        publisher.close()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of SetpointStream against the simulated controller.
+"""
+import threading
+import time
+
+from PyLinkam.Simulator import simulated_programmer
+from PyLinkam.Streaming import SetpointStream
+
+
+def test_latest_target_is_sent_after_min_delay():
+    prog = simulated_programmer(latency=0.001)
+    writes = []
+    write = prog.write
+
+    def timed_write(command, min_delay=None):
+        write(command, min_delay)
+        writes.append((prog.last_write, command))
+    prog.write = timed_write
+    on = True
+
+    def poll(): # another thread reading the temperature meanwhile
+        while on:
+            prog.snapshot()
+    poller = threading.Thread(target=poll)
+    poller.start()
+    with SetpointStream(prog) as stream:
+        for i in range(200):
+            stream.push(50 + i*0.5)
+            time.sleep(0.001)
+        time.sleep(0.05)
+    on = False
+    poller.join()
+    stats = stream.stats()
+    assert stats['sent'] > 0 and stats['errors'] == 0
+    assert stats['sent'] + stats['superseded'] + stats['stale'] + stats['unchanged'] == 200
+    assert prog.limit == 149.5 and prog.ser.controller.limit == 149.5
+    gaps = [t - t_previous for (t_previous, c), (t, command) in zip(writes, writes[1:])
+            if command.startswith('L1')]
+    assert min(gaps) >= prog.min_delay
+
+
+def wait_taken(stream):
+    # wait for the writer thread to take the target and wait for the lock
+    deadline = time.monotonic() + 1
+    while stream.target is not None:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+    time.sleep(0.01)
+
+
+def test_target_pushed_while_waiting_for_the_lock_is_sent_instead():
+    prog = simulated_programmer()
+    with SetpointStream(prog) as stream:
+        with prog.lock: # another thread using the controller
+            stream.push(50)
+            wait_taken(stream)
+            stream.push(60)
+        time.sleep(0.05)
+    stats = stream.stats()
+    assert stats['sent'] == 1 and stats['superseded'] == 1
+    assert list(prog.ser.controller.commands) == [b'L1600']
+
+
+def test_target_aged_while_waiting_for_the_lock_is_dropped():
+    prog = simulated_programmer()
+    with SetpointStream(prog, max_age=0.05) as stream:
+        with prog.lock:
+            stream.push(50)
+            wait_taken(stream)
+            time.sleep(0.05)
+        time.sleep(0.05)
+    stats = stream.stats()
+    assert stats['sent'] == 0 and stats['stale'] == 1
+    assert list(prog.ser.controller.commands) == []